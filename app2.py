@@ -1,12 +1,16 @@
 import os
 import logging
+import time
+import threading
 import aiohttp
+import metrics
 from datetime import datetime
 from telegram import (
     Update,
     KeyboardButton,
     ReplyKeyboardMarkup,
 )
+from telegram.error import BadRequest, TelegramError
 from telegram.ext import (
     ApplicationBuilder,
     CommandHandler,
@@ -14,7 +18,9 @@ from telegram.ext import (
     filters,
     ContextTypes,
 )
-from prompt import analyze_user_input, analyze_user_audio_input, DEFAULT_CARD_IMAGE, DEFAULT_MEME_IMAGE
+from audio_io import decode_voice_note, trim_clip
+from feature_detection import warm_up as warm_up_features
+from prompt import analyze_user_input, stream_user_input, analyze_user_audio_input, warm_up as warm_up_prompt, DEFAULT_CARD_IMAGE, DEFAULT_MEME_IMAGE
 
 # Logging configuration
 logging.basicConfig(level=logging.INFO)
@@ -25,9 +31,6 @@ if not BOT_TOKEN:
     logger.error("BOT_TOKEN is not set in environment variables.")
     raise EnvironmentError("Missing BOT_TOKEN.")
 
-VOICE_SAVE_PATH = "downloads"
-os.makedirs(VOICE_SAVE_PATH, exist_ok=True)
-
 WELCOME_MESSAGE = (
     "<b>🌟 Hey {first_name}! 🌟</b>\n\n"
     "I am <b>Gini 🧞‍♀️</b>, your virtual assistant.\n\n"
@@ -36,6 +39,14 @@ WELCOME_MESSAGE = (
     "🤖  /aboutme - Learn about me!"
 )
 
+# Streamed chit-chat replies: the message is sent once it has a few characters, then edited
+# at most once per STREAM_EDIT_INTERVAL seconds (Telegram rate-limits edits per chat)
+STREAM_REPLIES = os.getenv("STREAM_REPLIES", "1") != "0"
+STREAM_EDIT_INTERVAL = float(os.getenv("STREAM_EDIT_INTERVAL", 1.0))
+STREAM_FIRST_CHARS = 12
+
+SILENT_VOICE_TEXT = "🎙 I couldn't hear anything in that voice message. Could you try again a bit closer to the mic?"
+
 ABOUT_ME_TEXT = (
     "I am a Telegram bot developed by BT.\n"
     "I can read tarot cards and analyze your emotions from voice input.\n"
@@ -83,19 +94,25 @@ async def handle_text_input(update: Update, context: ContextTypes.DEFAULT_TYPE)
     today_date = datetime.now().strftime("%Y-%m-%d")
 
     last_reveal_date = context.user_data.get("last_reveal_date")
+    streamed, shown = None, ""
 
     #   If the user already got a tarot card today, override the response to chit-chat.
     if last_reveal_date == today_date:
         response = {"answer_type": "chit-chat", "response": {"text": "Let's chat! What's on your mind?"}}
     elif "awaiting_thoughts" in context.user_data:
         #   Instead of chit-chat, immediately analyze user input for a tarot card
-        response = await analyze_user_input(user_input)
+        response = await analyze_user_input(user_input, fast_path=False)
         del context.user_data["awaiting_thoughts"]
+    elif STREAM_REPLIES:
+        response, streamed, shown = await stream_reply(update, context, user_input)
     else:
         response = await analyze_user_input(user_input)
 
     if "error" in response:
-        await update.message.reply_text(response["error"])
+        if streamed is None:
+            await update.message.reply_text(response["error"])
+        else:
+            await edit_text(context, streamed, response["error"])  # Replaces the half-written reply
         return
 
     answer_type = response.get("answer_type")
@@ -112,7 +129,11 @@ async def handle_text_input(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
 
     elif answer_type == "chit-chat":
-        await update.message.reply_text(response_content.get("text", "Let's chat!"))
+        text = response_content.get("text", "Let's chat!")
+        if streamed is None:
+            await update.message.reply_text(text)
+        elif text != shown:
+            await edit_text(context, streamed, text)  # The rest of the streamed reply
 
     elif answer_type == "meme":
         image_link = response_content.get("image_link", DEFAULT_MEME_IMAGE)
@@ -127,36 +148,75 @@ async def handle_text_input(update: Update, context: ContextTypes.DEFAULT_TYPE)
         await update.message.reply_text("I'm not sure how to respond. Can you rephrase?")
 
 
+async def stream_reply(update: Update, context: ContextTypes.DEFAULT_TYPE, user_input: str):
+    """
+    Gets the answer through `stream_user_input`, showing a chit-chat reply while it is written.
+
+    Returns (response, the message sent for the reply or None, the text it shows).
+    """
+    response, message, shown, last_edit = None, None, "", 0.0
+    async for kind, value in stream_user_input(user_input):
+        if kind == "text":
+            now = time.monotonic()
+            if message is None and len(value) >= STREAM_FIRST_CHARS:
+                message = await update.message.reply_text(value)
+                shown, last_edit = value, now
+            elif message is not None and now - last_edit >= STREAM_EDIT_INTERVAL:
+                await edit_text(context, message, value)
+                shown, last_edit = value, now
+        elif kind == "done":
+            response = value
+    return response, message, shown
+
+
+async def edit_text(context: ContextTypes.DEFAULT_TYPE, message, text: str) -> None:
+    """Replaces the text of a sent message; a skipped progress edit is not worth failing the reply for."""
+    try:
+        await context.bot.edit_message_text(chat_id=message.chat_id, message_id=message.message_id, text=text)
+    except BadRequest as e:
+        if "not modified" not in str(e).lower():
+            logger.warning(f"Could not edit message {message.message_id}: {e}")
+    except TelegramError as e:
+        logger.warning(f"Could not edit message {message.message_id}: {e}")
+
+
 async def handle_voice_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Process voice messages for emotion analysis."""
     voice = update.message.voice
     file_id = voice.file_id
-    file_path = os.path.join(VOICE_SAVE_PATH, f"{file_id}.oga")
 
-    #   Download voice file from Telegram
+    #   Download the voice note into memory
     file = await context.bot.get_file(file_id)
     async with aiohttp.ClientSession() as session:
         async with session.get(file.file_path) as resp:
-            if resp.status == 200:
-                with open(file_path, "wb") as f:
-                    f.write(await resp.read())
+            if resp.status != 200:
+                logger.error(f"Voice download failed for {file_id}: HTTP {resp.status}")
+                await update.message.reply_text("⚠️ Error processing audio. Please try again.")
+                return
+            voice_bytes = await resp.read()
 
-    logger.info(f"Downloaded voice file: {file_path}")
+    logger.info(f"Downloaded voice note {file_id} ({len(voice_bytes)} bytes)")
 
-    #   Convert .oga to .wav
-    wav_path = file_path.replace(".oga", ".wav")
-    conversion_cmd = f"ffmpeg -i {file_path} -ar 16000 -ac 1 {wav_path}"
-    
+    #   Decode OGG/Opus straight to 16 kHz mono samples
     try:
-        os.system(conversion_cmd)
-        logger.info(f"Converted to WAV: {wav_path}")
+        clip = await decode_voice_note(voice_bytes, name=file_id)
     except Exception as e:
         logger.error(f"Error converting audio: {e}")
         await update.message.reply_text("⚠️ Error processing audio. Please try again.")
         return
 
+    #   Cut silence before both feature extraction and the upload to the audio model
+    clip, trim = trim_clip(clip)
+    logger.info(
+        f"Trimmed voice note {file_id}: kept {trim.kept_seconds:.1f}s of {trim.original_seconds:.1f}s"
+        f" (dropped {trim.dropped_seconds:.1f}s, {trim.speech_seconds:.1f}s speech)"
+    )
+    if trim.is_silent:
+        await update.message.reply_text(SILENT_VOICE_TEXT)
+        return
+
     #   Analyze the audio
-    response = await analyze_user_audio_input(wav_path)
+    response = await analyze_user_audio_input(clip)
 
     if "error" in response:
         await update.message.reply_text("⚠️ Error processing audio. Please try again.")
@@ -180,6 +240,16 @@ async def handle_voice_message(update: Update, context: ContextTypes.DEFAULT_TYP
 def main() -> None:
     """Run the Telegram bot."""
     print("Bot is starting...")
+    warm_up_prompt()
+
+    #   Load librosa and compile its kernels while the bot already polls
+    threading.Thread(target=warm_up_features, name="feature-warm-up", daemon=True).start()
+
+    #   Prometheus scrape endpoint for feature/LLM metrics, off unless METRICS_PORT is set
+    if os.getenv("METRICS_PORT"):
+        metrics.start_metrics_server(int(os.getenv("METRICS_PORT")))
+        print(f"Serving metrics on :{os.getenv('METRICS_PORT')}/metrics")
+
     application = ApplicationBuilder().token(BOT_TOKEN).build()
 
     #   Command Handlers
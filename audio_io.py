@@ -0,0 +1,185 @@
+"""
+In-memory audio for the bot: voice notes are decoded straight from the
+downloaded bytes with an ffmpeg pipe, so nothing touches the disk between
+Telegram and the analysis.
+
+    clip = await decode_voice_note(ogg_bytes, name=file_id)
+    clip, trim = trim_clip(clip)  # drop leading/trailing silence and long pauses
+    features = extract_features_from_array(clip.samples, clip.sr, name=clip.name)
+"""
+import io
+import wave
+import asyncio
+from typing import NamedTuple
+import fast_features
+import metrics
+from utils import LazyModule
+
+np = LazyModule("numpy")
+
+# Rate and layout the bot analyses voice notes at (same as the old ffmpeg -ar 16000 -ac 1 call)
+VOICE_SAMPLE_RATE = 16000
+FFMPEG = "ffmpeg"
+
+# Silence trimming: a 25 ms frame is speech when its RMS is within VAD_TOP_DB of
+# the loudest frame and above VAD_FLOOR_DB (dBFS), so a clip of room noise has no speech at all
+VAD_FRAME_SECONDS = 0.025
+VAD_HOP_SECONDS = 0.010
+VAD_TOP_DB = 40.0
+VAD_FLOOR_DB = -50.0
+VAD_PAD_SECONDS = 0.1  # silence kept around every speech segment
+VAD_MAX_PAUSE_SECONDS = 0.6  # longer pauses are cut down to 2 * VAD_PAD_SECONDS
+VAD_MIN_SPEECH_SECONDS = 0.25  # less speech than this counts as an all-silence clip
+
+INPUT_SECONDS = metrics.counter("voice_input_seconds_total", "Seconds of decoded voice notes before trimming.")
+DROPPED_SECONDS = metrics.counter("voice_dropped_seconds_total", "Seconds of silence cut by trim_clip.")
+SILENT_CLIPS = metrics.counter("voice_silent_clips_total", "Voice notes with no speech, answered without the LLM.")
+
+
+class AudioClip(NamedTuple):
+    """A decoded clip together with the bytes it was decoded from."""
+
+    samples: "np.ndarray"  # mono float32 in [-1, 1]
+    sr: int
+    encoded: bytes  # original container bytes (e.g. OGG/Opus), used as the cache key
+    name: str = ""
+    trim: tuple = ()  # trim_silence settings applied to `samples`, part of the cache key
+
+    @property
+    def duration(self) -> float:
+        return len(self.samples) / self.sr
+
+    def wav_bytes(self) -> bytes:
+        """The samples as a 16-bit PCM WAV file, the format the audio model accepts."""
+        return to_wav_bytes(self.samples, self.sr)
+
+
+def ffmpeg_decode_args(sr: int = VOICE_SAMPLE_RATE) -> list:
+    """ffmpeg arguments that read any container on stdin and write mono float32 PCM to stdout."""
+    return [
+        FFMPEG, "-nostdin", "-hide_banner", "-loglevel", "error",
+        "-i", "pipe:0",
+        "-f", "f32le", "-acodec", "pcm_f32le", "-ac", "1", "-ar", str(sr),
+        "pipe:1",
+    ]
+
+
+def _samples(pcm: bytes, stderr: bytes, returncode: int):
+    if returncode != 0:
+        raise RuntimeError(f"ffmpeg failed to decode audio: {stderr.decode('utf-8', 'replace').strip()}")
+    return np.frombuffer(pcm, dtype=np.float32)
+
+
+async def decode_audio(data: bytes, sr: int = VOICE_SAMPLE_RATE):
+    """Decodes encoded audio bytes to a mono float32 array at `sr` without blocking the event loop."""
+    process = await asyncio.create_subprocess_exec(
+        *ffmpeg_decode_args(sr),
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    pcm, stderr = await process.communicate(data)
+    return _samples(pcm, stderr, process.returncode)
+
+
+def decode_audio_sync(data: bytes, sr: int = VOICE_SAMPLE_RATE):
+    """Blocking version of `decode_audio`, for scripts."""
+    import subprocess
+
+    result = subprocess.run(ffmpeg_decode_args(sr), input=data, capture_output=True)
+    return _samples(result.stdout, result.stderr, result.returncode)
+
+
+async def decode_voice_note(data: bytes, name: str = "", sr: int = VOICE_SAMPLE_RATE) -> AudioClip:
+    """Decodes a downloaded Telegram voice note (OGG/Opus) into an AudioClip."""
+    return AudioClip(await decode_audio(data, sr), sr, data, name)
+
+
+def to_wav_bytes(samples, sr: int) -> bytes:
+    """Encodes mono float samples as a 16-bit PCM WAV file in memory."""
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sr)
+        wav.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+class TrimStats(NamedTuple):
+    """How much of a clip `trim_silence` kept."""
+
+    original_seconds: float
+    kept_seconds: float
+    speech_seconds: float
+
+    @property
+    def dropped_seconds(self) -> float:
+        return self.original_seconds - self.kept_seconds
+
+    @property
+    def is_silent(self) -> bool:
+        return self.speech_seconds < VAD_MIN_SPEECH_SECONDS
+
+
+def speech_intervals(samples, sr: int, top_db: float = VAD_TOP_DB, floor_db: float = VAD_FLOOR_DB):
+    """Returns (start, end) sample ranges of consecutive speech frames."""
+    frame_length = int(VAD_FRAME_SECONDS * sr)
+    hop_length = int(VAD_HOP_SECONDS * sr)
+    if len(samples) < frame_length:
+        return []
+
+    rms = fast_features.rms(samples, frame_length, hop_length, center=False)
+    db = 20 * np.log10(np.maximum(rms, 1e-10))
+    speech = db > max(db.max() - top_db, floor_db)
+
+    #   Rising and falling edges of the speech mask
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], speech.astype(np.int8), [0]))))
+    starts, ends = edges[::2], edges[1::2]
+    return [(start * hop_length, (end - 1) * hop_length + frame_length) for start, end in zip(starts, ends)]
+
+
+def trim_silence(
+    samples,
+    sr: int,
+    top_db: float = VAD_TOP_DB,
+    floor_db: float = VAD_FLOOR_DB,
+    pad: float = VAD_PAD_SECONDS,
+    max_pause: float = VAD_MAX_PAUSE_SECONDS,
+):
+    """
+    Cuts leading and trailing silence and shortens pauses longer than `max_pause`.
+
+    Returns the trimmed samples and a TrimStats. An all-silence clip comes back
+    empty with `stats.is_silent` set.
+    """
+    intervals = speech_intervals(samples, sr, top_db, floor_db)
+    speech_seconds = float(sum(end - start for start, end in intervals)) / sr
+    original_seconds = len(samples) / sr
+    if not intervals or speech_seconds < VAD_MIN_SPEECH_SECONDS:
+        return samples[:0], TrimStats(original_seconds, 0.0, speech_seconds)
+
+    pad_samples, max_gap = int(pad * sr), int(max_pause * sr)
+    kept = []
+    for start, end in intervals:
+        start, end = max(start - pad_samples, 0), min(end + pad_samples, len(samples))
+        if kept and start - kept[-1][1] <= max_gap:
+            kept[-1][1] = end  # short pause, keep it
+        else:
+            kept.append([start, end])
+
+    trimmed = np.concatenate([samples[start:end] for start, end in kept])
+    return trimmed, TrimStats(original_seconds, len(trimmed) / sr, speech_seconds)
+
+
+def trim_clip(clip: AudioClip, **kwargs):
+    """`trim_silence` for an AudioClip; returns the trimmed clip and its TrimStats."""
+    samples, stats = trim_silence(clip.samples, clip.sr, **kwargs)
+    INPUT_SECONDS.inc(stats.original_seconds)
+    DROPPED_SECONDS.inc(stats.dropped_seconds)
+    if stats.is_silent:
+        SILENT_CLIPS.inc()
+    settings = dict(top_db=VAD_TOP_DB, floor_db=VAD_FLOOR_DB, pad=VAD_PAD_SECONDS, max_pause=VAD_MAX_PAUSE_SECONDS)
+    settings.update(kwargs)
+    return clip._replace(samples=samples, trim=tuple(sorted(settings.items()))), stats
@@ -1,14 +1,10 @@
-import os
 import random
-from openai import OpenAI
 from dotenv import load_dotenv
+import llm_accounting
+from llm_client import get_client, timeout_for
 
 # Load environment variables
 load_dotenv()
-api_key = os.getenv("OPENAI_API_KEY")
-
-# Initialize OpenAI client
-client = OpenAI(api_key=api_key)
 
 # Tarot card data
 tarot_cards = {
@@ -34,22 +30,25 @@ def determine_tarot_card():
 def get_user_emotion(user_input):
     """Analyze the sentiment of the user's input."""
     try:
-        emotion = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You will be provided with a user context, and your task is to classify its sentiment as positive, neutral, or negative."
-                },
-                {
-                    "role": "user",
-                    "content": user_input
-                }
-            ],
-            temperature=1,
-            max_tokens=256,
-            top_p=1
-        )
+        with llm_accounting.track("backend_logic", "gpt-4", answer_type="sentiment") as call:
+            emotion = get_client().chat.completions.create(
+                model="gpt-4",
+                timeout=timeout_for("chat"),
+                messages=[
+                    {
+                        "role": "system",
+                        "content": "You will be provided with a user context, and your task is to classify its sentiment as positive, neutral, or negative."
+                    },
+                    {
+                        "role": "user",
+                        "content": user_input
+                    }
+                ],
+                temperature=1,
+                max_tokens=256,
+                top_p=1
+            )
+            call.set_response(emotion)
         return emotion.choices[0].message.content
     except Exception as e:
         return f"Error in sentiment analysis: {str(e)}"
@@ -57,22 +56,25 @@ def get_user_emotion(user_input):
 def get_tarot_reading(question, card, meaning):
     """Generate a tarot reading response based on the question and card."""
     try:
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You will be provided with a tarot card and its meaning. Your task is to respond like a tarot reader while subtly assessing if the individual requires mental health support in the background. If an individual needs support, you keep asking questions; otherwise, say thank you and bless them to have a good day."
-                },
-                {
-                    "role": "user",
-                    "content": f"{question} {card} {meaning}"
-                }
-            ],
-            temperature=1,
-            max_tokens=256,
-            top_p=1
-        )
+        with llm_accounting.track("backend_logic", "gpt-4", answer_type="tarot-reading") as call:
+            response = get_client().chat.completions.create(
+                model="gpt-4",
+                timeout=timeout_for("chat"),
+                messages=[
+                    {
+                        "role": "system",
+                        "content": "You will be provided with a tarot card and its meaning. Your task is to respond like a tarot reader while subtly assessing if the individual requires mental health support in the background. If an individual needs support, you keep asking questions; otherwise, say thank you and bless them to have a good day."
+                    },
+                    {
+                        "role": "user",
+                        "content": f"{question} {card} {meaning}"
+                    }
+                ],
+                temperature=1,
+                max_tokens=256,
+                top_p=1
+            )
+            call.set_response(response)
         return response.choices[0].message.content
     except Exception as e:
         return f"Error in tarot reading generation: {str(e)}"
@@ -0,0 +1,234 @@
+import os
+import csv
+import json
+import argparse
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from feature_config import (
+    RESAMPLE_POLICIES, RESAMPLE_POLICY, PITCH_MODES, PITCH_MODE, BACKENDS, BACKEND, feature_config
+)
+from feature_detection import extract_features, extract_features_batch, FEATURE_COLUMNS
+
+# Folders scanned when no input is given on the command line
+DEFAULT_AUDIO_DIRS = ["converted_wav", "short_audio_files"]
+DEFAULT_OUTPUT_CSV = "audio_features.csv"
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".flac")
+
+
+def find_audio_files(roots):
+    """Collects audio files under the given folders (recursively), sorted for a stable order."""
+    audio_files = []
+    for root in roots:
+        if os.path.isfile(root):
+            audio_files.append(root)
+            continue
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                if filename.endswith(AUDIO_EXTENSIONS):
+                    audio_files.append(os.path.join(dirpath, filename))
+    return sorted(audio_files)
+
+
+def load_done_filenames(output_csv):
+    """
+    Returns the filenames already written to the CSV so a crashed run can resume.
+
+    A row cut off by a crash is dropped from the file first, so it gets re-extracted.
+    """
+    if not os.path.exists(output_csv):
+        return set()
+
+    with open(output_csv, "rb+") as f:
+        content = f.read()
+        if content and not content.endswith(b"\n"):
+            f.truncate(content.rfind(b"\n") + 1)
+
+    with open(output_csv, "r", newline="") as f:
+        return {row["filename"] for row in csv.DictReader(f)}
+
+
+def config_path(output_csv):
+    """Sidecar recording the feature settings a CSV was built with."""
+    return output_csv + ".config.json"
+
+
+def check_csv_config(output_csv, config):
+    """
+    Makes sure rows appended to a CSV are built like the ones already in it.
+
+    A new or empty CSV gets `config` written next to it. An existing one must
+    have a matching sidecar; otherwise a ValueError says what differs.
+    """
+    has_rows = os.path.exists(output_csv) and os.path.getsize(output_csv) > 0
+    path = config_path(output_csv)
+    if not has_rows:
+        with open(path, "w") as f:
+            json.dump(config, f, indent=2, sort_keys=True)
+        return
+
+    if not os.path.exists(path):
+        raise ValueError(
+            f"{output_csv} has rows but no {path}, so its feature settings are unknown. "
+            f"Write to a new CSV with -o, or add the sidecar if you know how it was built."
+        )
+    with open(path, "r") as f:
+        stored = json.load(f)
+    if stored != config:
+        differences = ", ".join(
+            f"{key}: {stored.get(key)!r} in the CSV, {config.get(key)!r} now"
+            for key in sorted(set(stored) | set(config)) if stored.get(key) != config.get(key)
+        )
+        raise ValueError(f"{output_csv} was built with other feature settings ({differences}). "
+                         f"Pass the same settings or write to a new CSV with -o.")
+
+
+def extract_chunk(files, batched=False, **kwargs):
+    """Worker task: features for a list of files, as one length-bucketed batch or one file at a time."""
+    if batched:
+        return extract_features_batch(files, **kwargs)
+    return [extract_features(file, **kwargs) for file in files]
+
+
+def run_batch(audio_files, output_csv=DEFAULT_OUTPUT_CSV, workers=None, resample_policy=None, pitch_mode=None,
+              backend=None, vectors_dir=None, batch_size=None):
+    """
+    Extracts features for every file across a process pool and appends each row
+    to the CSV as soon as it finishes.
+
+    Rows already in the CSV are kept as they are, so a run must use the same
+    feature settings the file was started with; they are kept in a sidecar
+    next to the CSV and a mismatch raises ValueError before anything runs. With
+    `vectors_dir`, rich feature vectors are also written to a columnar dataset
+    there (see feature_store.py), and files missing from it are re-extracted.
+    With `batch_size`, each worker task is that many files of similar size,
+    run through `extract_features_batch` (not combined with `vectors_dir`).
+
+    Returns:
+        tuple: (number of files extracted, number of files that failed)
+    """
+    check_csv_config(output_csv, feature_config(resample_policy, pitch_mode, backend))
+    done = load_done_filenames(output_csv)
+    todo_done = done
+    if vectors_dir:
+        from feature_store import FeatureDataset, INDEX_FILE
+
+        has_vectors = os.path.exists(os.path.join(vectors_dir, INDEX_FILE))
+        todo_done = done & set(FeatureDataset(vectors_dir).filenames if has_vectors else [])
+
+    todo = [file for file in audio_files if os.path.basename(file) not in todo_done]
+    print(f"  {len(todo_done)} files already in {output_csv}, {len(todo)} to extract.")
+
+    if not todo:
+        return 0, 0
+
+    write_header = not os.path.exists(output_csv) or os.path.getsize(output_csv) == 0
+    written, failed = 0, 0
+    vector_rows = []
+
+    try:
+        with open(output_csv, "a", newline="") as out, ProcessPoolExecutor(max_workers=workers) as pool:
+            writer = csv.DictWriter(out, fieldnames=FEATURE_COLUMNS, extrasaction="ignore")
+            if write_header:
+                writer.writeheader()
+
+            if batch_size and not vectors_dir:
+                #   Similar file sizes give similar lengths, so the batch buckets stay full
+                by_size = sorted(todo, key=os.path.getsize)
+                chunks = [by_size[i:i + batch_size] for i in range(0, len(by_size), batch_size)]
+                extract = partial(
+                    extract_chunk, batched=True, resample_policy=resample_policy, pitch_mode=pitch_mode, backend=backend
+                )
+            else:
+                chunks = [[file] for file in todo]
+                extract = partial(
+                    extract_chunk,
+                    resample_policy=resample_policy,
+                    pitch_mode=pitch_mode,
+                    backend=backend,
+                    rich=bool(vectors_dir),
+                )
+            futures = {pool.submit(extract, chunk): chunk for chunk in chunks}
+            for future in as_completed(futures):
+                chunk = futures[future]
+                try:
+                    results = future.result()
+                except Exception as e:
+                    print(f"  Worker failed on {', '.join(chunk)}: {e}")
+                    results = [None] * len(chunk)
+
+                for features in results:
+                    if features is None:
+                        failed += 1
+                        continue
+
+                    if vectors_dir:
+                        vector_rows.append(features)
+                    if features["filename"] not in done:
+                        writer.writerow(features)
+                        out.flush()  # Keep finished rows on disk in case the run crashes
+                    written += 1
+                    if written % 50 == 0:
+                        print(f"  {written}/{len(todo)} files extracted")
+    finally:
+        if vector_rows:
+            from feature_store import write_feature_dataset
+
+            write_feature_dataset(vectors_dir, vector_rows)
+
+    return written, failed
+
+
+def write_report(output_csv, report_path="audio_feature_report.html"):
+    """Generates the YData profile report for the extracted features."""
+    import pandas as pd
+    from ydata_profiling import ProfileReport
+
+    df = pd.read_csv(output_csv)
+    ProfileReport(df, title="Audio Feature Summary").to_file(report_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract audio features for a folder of clips into a CSV.")
+    parser.add_argument("inputs", nargs="*", default=DEFAULT_AUDIO_DIRS, help="Audio files or folders to scan.")
+    parser.add_argument("-o", "--output", default=DEFAULT_OUTPUT_CSV, help="CSV file to append rows to.")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="Worker processes (default: CPU count).")
+    parser.add_argument(
+        "--policy",
+        choices=sorted(RESAMPLE_POLICIES),
+        default=RESAMPLE_POLICY,
+        help="Resampling policy. The checked-in audio_features.csv predates versioned settings "
+             "(see audio_features.csv.config.json), so new runs need a new CSV.",
+    )
+    parser.add_argument("--pitch-mode", choices=PITCH_MODES, default=PITCH_MODE, help="Pitch tracking mode.")
+    parser.add_argument("--backend", choices=BACKENDS, default=BACKEND, help="Backend for RMS, ZCR and centroid.")
+    parser.add_argument("--vectors", metavar="DIR", help="Also store rich feature vectors in this dataset folder.")
+    parser.add_argument(
+        "--batch", type=int, metavar="N", help="Extract N similar-length files per task as one matrix batch."
+    )
+    parser.add_argument("--report", action="store_true", help="Also write audio_feature_report.html.")
+    args = parser.parse_args()
+
+    audio_files = find_audio_files([path for path in args.inputs if os.path.exists(path)])
+    try:
+        written, failed = run_batch(
+            audio_files,
+            args.output,
+            workers=args.workers,
+            resample_policy=args.policy,
+            pitch_mode=args.pitch_mode,
+            backend=args.backend,
+            vectors_dir=args.vectors,
+            batch_size=args.batch,
+        )
+    except ValueError as e:
+        raise SystemExit(f"  {e}")
+    print(f"  Extracted {written} files into {args.output} ({failed} failed).")
+
+    if args.report:
+        write_report(args.output)
+
+    print(f"  Feature extraction completed! Check `{args.output}`.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Parity check and micro-benchmark for the NumPy frame features in fast_features.py.
+
+Every clip in short_audio_files/ is loaded at the default analysis rate, and
+RMS, zero-crossing rate and spectral centroid are compared frame by frame with
+librosa. The script exits non-zero if any clip is out of tolerance, then times
+both implementations on a longer signal. test_fast_features.py holds the
+parity tests proper, including silent and sub-frame clips.
+
+    python bench_fast_features.py
+"""
+import os
+import sys
+import glob
+import time
+import argparse
+import numpy as np
+import librosa
+import fast_features
+from feature_detection import load_audio, compute_spectrogram
+
+RTOL = 1e-5
+ATOL = 1e-7
+
+
+def implementations(sr):
+    """Pairs of (librosa, numpy) functions taking (y, S)."""
+    return {
+        "rms": (
+            lambda y, S: librosa.feature.rms(y=y)[0],
+            lambda y, S: fast_features.rms(y),
+        ),
+        "zero_crossing_rate": (
+            lambda y, S: librosa.feature.zero_crossing_rate(y)[0],
+            lambda y, S: fast_features.zero_crossing_rate(y),
+        ),
+        "spectral_centroid": (
+            lambda y, S: librosa.feature.spectral_centroid(S=S, sr=sr)[0],
+            lambda y, S: fast_features.spectral_centroid(S, sr),
+        ),
+    }
+
+
+def check_parity(audio_files):
+    """Returns {feature: worst relative error} and the clips that failed."""
+    worst, failures = {}, []
+    for file in audio_files:
+        y, sr = load_audio(file)
+        S = compute_spectrogram(y)
+        for name, (reference, fast) in implementations(sr).items():
+            expected, actual = reference(y, S), fast(y, S)
+            error = np.max(np.abs(actual - expected) / (np.abs(expected) + ATOL)) if expected.size else 0.0
+            worst[name] = max(worst.get(name, 0.0), float(error))
+            if expected.shape != actual.shape or not np.allclose(actual, expected, rtol=RTOL, atol=ATOL):
+                failures.append((os.path.basename(file), name))
+    return worst, failures
+
+
+def benchmark(audio_files, seconds=60.0, repeat=20):
+    """Times both implementations on `seconds` of concatenated clips."""
+    clips, sr = [], None
+    for file in audio_files:
+        y, sr = load_audio(file)
+        clips.append(y)
+        if sum(len(clip) for clip in clips) >= seconds * sr:
+            break
+    y = np.concatenate(clips)
+    S = compute_spectrogram(y)
+
+    results = {}
+    for name, (reference, fast) in implementations(sr).items():
+        timings = []
+        for function in (reference, fast):
+            function(y, S)  # Warm up
+            start = time.perf_counter()
+            for _ in range(repeat):
+                function(y, S)
+            timings.append((time.perf_counter() - start) / repeat)
+        results[name] = timings
+    return len(y) / sr, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--audio-dir", default="short_audio_files")
+    parser.add_argument("--clips", type=int, default=None, help="Only check the first N clips.")
+    args = parser.parse_args()
+
+    audio_files = sorted(glob.glob(os.path.join(args.audio_dir, "*.wav")))[: args.clips]
+    if not audio_files:
+        raise SystemExit(f"No .wav files found in {args.audio_dir}")
+
+    worst, failures = check_parity(audio_files)
+    print(f"Parity with librosa on {len(audio_files)} clips (rtol={RTOL}):")
+    for name, error in worst.items():
+        print(f"  {name:<20} worst relative error {error:.2e}")
+
+    duration, results = benchmark(audio_files)
+    print(f"\nTime per call on {duration:.0f}s of audio:")
+    for name, (librosa_seconds, numpy_seconds) in results.items():
+        print(
+            f"  {name:<20} librosa {librosa_seconds * 1000:7.2f} ms   numpy {numpy_seconds * 1000:7.2f} ms"
+            f"   {librosa_seconds / numpy_seconds:5.1f}x"
+        )
+
+    if failures:
+        print(f"\n{len(failures)} parity failures, e.g. {failures[:5]}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
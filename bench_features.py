@@ -0,0 +1,164 @@
+"""
+Feature-extraction benchmark over the short_audio_files/ corpus.
+
+Reports wall time per feature stage, end-to-end clips/sec and peak RSS, and
+writes everything to JSON so runs can be compared between commits:
+
+    python bench_features.py --output bench/HEAD.json
+    python bench_features.py --output bench/new.json --compare bench/HEAD.json
+"""
+import os
+import sys
+import glob
+import json
+import time
+import platform
+import resource
+import argparse
+import subprocess
+from collections import defaultdict
+import numpy as np
+import librosa
+from feature_config import feature_config, get_pitch_mode, get_backend
+from feature_detection import (
+    extract_features,
+    load_audio,
+    compute_spectrogram,
+    frame_rms,
+    frame_zero_crossing_rate,
+    frame_spectral_centroid,
+    voiced_pitch,
+    warm_up,
+    PITCH_FMIN,
+    PITCH_FMAX,
+)
+
+
+def time_stages(file_path, resample_policy, pitch_mode, backend, timings):
+    """Runs each stage of extract_features separately and adds its wall time to `timings`."""
+
+    def timed(stage, function, *args, **kwargs):
+        start = time.perf_counter()
+        result = function(*args, **kwargs)
+        timings[stage] += time.perf_counter() - start
+        return result
+
+    y, sr = timed("load", load_audio, file_path, resample_policy)
+    S = timed("stft", compute_spectrogram, y)
+    mel = timed("mel_spectrogram", librosa.feature.melspectrogram, S=S ** 2, sr=sr)
+    timed("mfcc", lambda: librosa.feature.mfcc(S=librosa.power_to_db(mel), sr=sr))
+    timed("spectral_centroid", frame_spectral_centroid, S, sr, backend)
+    timed("spectral_contrast", librosa.feature.spectral_contrast, S=S, sr=sr)
+    timed("rms_energy", frame_rms, y, backend)
+    timed("zero_crossing_rate", frame_zero_crossing_rate, y, backend)
+    if pitch_mode == "voiced":
+        timed("pitch", voiced_pitch, y, sr, backend=backend)
+    else:
+        timed("pitch", librosa.yin, y, sr=sr, fmin=PITCH_FMIN, fmax=PITCH_FMAX)
+    return len(y) / sr
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (ru_maxrss is KB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+def run_benchmark(audio_files, resample_policy=None, pitch_mode=None, backend=None):
+    """Benchmarks stage timings and end-to-end throughput for the given clips."""
+    pitch_mode, backend = get_pitch_mode(pitch_mode), get_backend(backend)
+    warm_up()
+
+    timings = defaultdict(float)
+    audio_seconds = sum(time_stages(file, resample_policy, pitch_mode, backend, timings) for file in audio_files)
+
+    latencies = []
+    for file in audio_files:
+        start = time.perf_counter()
+        extract_features(file, resample_policy=resample_policy, pitch_mode=pitch_mode, backend=backend)
+        latencies.append(time.perf_counter() - start)
+    total = sum(latencies)
+
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "librosa": librosa.__version__,
+        "config": feature_config(resample_policy, pitch_mode, backend),
+        "clips": len(audio_files),
+        "audio_seconds": audio_seconds,
+        "stage_seconds": dict(timings),
+        "stage_share": {stage: seconds / sum(timings.values()) for stage, seconds in timings.items()},
+        "extract_seconds": total,
+        "clips_per_second": len(audio_files) / total,
+        "realtime_factor": audio_seconds / total,
+        "latency_ms": {
+            "p50": float(np.percentile(latencies, 50) * 1000),
+            "p95": float(np.percentile(latencies, 95) * 1000),
+            "max": float(np.max(latencies) * 1000),
+        },
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def print_report(report, baseline=None):
+    def change(key, value, lower_is_better=True):
+        if not baseline or key not in baseline:
+            return ""
+        before = baseline[key]
+        ratio = before / value if lower_is_better else value / before
+        return f"  ({ratio:.2f}x vs {baseline.get('commit') or 'baseline'})"
+
+    print(f"{report['clips']} clips, {report['audio_seconds']:.1f}s of audio, config {report['config']}")
+    print("\nStage                wall time   share")
+    for stage, seconds in sorted(report["stage_seconds"].items(), key=lambda item: -item[1]):
+        before = (baseline or {}).get("stage_seconds", {}).get(stage)
+        ratio = f"  ({before / seconds:.2f}x)" if before else ""
+        print(f"  {stage:<18} {seconds:8.3f}s  {report['stage_share'][stage]:6.1%}{ratio}")
+
+    print(f"\nclips/sec         {report['clips_per_second']:8.1f}{change('clips_per_second', report['clips_per_second'], False)}")
+    print(f"realtime factor   {report['realtime_factor']:8.1f}x")
+    print(f"latency p50/p95   {report['latency_ms']['p50']:.1f} / {report['latency_ms']['p95']:.1f} ms")
+    print(f"peak RSS          {report['peak_rss_mb']:8.1f} MB{change('peak_rss_mb', report['peak_rss_mb'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--audio-dir", default="short_audio_files")
+    parser.add_argument("--clips", type=int, default=None, help="Only use the first N clips.")
+    parser.add_argument("--policy", default=None, help="Resampling policy (default: FEATURE_RESAMPLE_POLICY).")
+    parser.add_argument("--pitch-mode", default=None, help="Pitch mode (default: FEATURE_PITCH_MODE).")
+    parser.add_argument("--backend", default=None, help="Frame feature backend (default: FEATURE_BACKEND).")
+    parser.add_argument("--output", help="Write the report to this JSON file.")
+    parser.add_argument("--compare", help="Earlier JSON report to compare against.")
+    args = parser.parse_args()
+
+    audio_files = sorted(glob.glob(os.path.join(args.audio_dir, "*.wav")))[: args.clips]
+    if not audio_files:
+        raise SystemExit(f"No .wav files found in {args.audio_dir}")
+
+    report = run_benchmark(audio_files, args.policy, args.pitch_mode, args.backend)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.output:
+        if os.path.dirname(args.output):
+            os.makedirs(os.path.dirname(args.output), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
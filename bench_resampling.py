@@ -0,0 +1,69 @@
+"""
+Benchmarks extract_features under each resampling policy.
+
+Two inputs are timed: dataset clips from short_audio_files/ as they are
+(44.1 kHz), and the same clips converted to 16 kHz mono, which is what the bot
+gets from ffmpeg for every voice note.
+
+    python bench_resampling.py --clips 50
+"""
+import os
+import glob
+import time
+import argparse
+import tempfile
+import librosa
+import soundfile as sf
+from feature_config import RESAMPLE_POLICIES
+from feature_detection import extract_features
+
+
+def make_voice_note_copies(audio_files, out_dir, sr=16000):
+    """Writes 16 kHz mono copies of the clips, like app2.handle_voice_message produces."""
+    copies = []
+    for file in audio_files:
+        y, _ = librosa.load(file, sr=sr, mono=True)
+        copy = os.path.join(out_dir, os.path.basename(file))
+        sf.write(copy, y, sr)
+        copies.append(copy)
+    return copies
+
+
+def time_policy(audio_files, policy):
+    """Returns seconds spent extracting features for all files under one policy."""
+    extract_features(audio_files[0], resample_policy=policy)  # Warm up numba/FFT plans
+    start = time.perf_counter()
+    for file in audio_files:
+        extract_features(file, resample_policy=policy)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--audio-dir", default="short_audio_files")
+    parser.add_argument("--clips", type=int, default=50, help="Number of clips to time.")
+    args = parser.parse_args()
+
+    audio_files = sorted(glob.glob(os.path.join(args.audio_dir, "*.wav")))[: args.clips]
+    if not audio_files:
+        raise SystemExit(f"No .wav files found in {args.audio_dir}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        inputs = {
+            "dataset clips (native rate)": audio_files,
+            "voice notes (16 kHz mono)": make_voice_note_copies(audio_files, tmp),
+        }
+
+        for label, files in inputs.items():
+            print(f"\n{label}, {len(files)} clips")
+            timings = {policy: time_policy(files, policy) for policy in RESAMPLE_POLICIES}
+            baseline = timings["legacy"]
+            for policy, seconds in timings.items():
+                print(
+                    f"  {policy:<12} {seconds:7.2f}s  {len(files) / seconds:7.1f} clips/s"
+                    f"  {baseline / seconds:5.2f}x vs legacy"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Measures cold start: importing the bot's modules, warming up, and the first
+voice-note extraction with and without a warm-up.
+
+Each measurement runs in a fresh interpreter so nothing is cached between them.
+
+    python bench_startup.py
+"""
+import sys
+import json
+import argparse
+import subprocess
+
+SAMPLE_CLIP = "short_audio_files/s001_middle_actor001_impro1_1.wav"
+
+SNIPPETS = {
+    "import feature_detection": "import feature_detection",
+    "import prompt": "import prompt",
+    "feature_detection.warm_up()": "import feature_detection\nfeature_detection.warm_up()",
+    "first clip, cold": "import feature_detection\nfeature_detection.extract_features(CLIP)",
+    "first clip, after warm_up": (
+        "import feature_detection\nfeature_detection.warm_up()\n"
+        "start = time.perf_counter()\nfeature_detection.extract_features(CLIP)"
+    ),
+}
+
+RUNNER = """
+import sys, time, json
+CLIP = {clip!r}
+start = time.perf_counter()
+{snippet}
+elapsed = time.perf_counter() - start
+heavy = [name for name in ("librosa", "numba", "numpy", "openai") if name in sys.modules]
+print(json.dumps({{"seconds": elapsed, "loaded": heavy}}))
+"""
+
+
+def measure(snippet, clip, repeat):
+    """Runs a snippet in fresh interpreters and returns the best time and the heavy modules it loaded."""
+    runs = []
+    for _ in range(repeat):
+        code = RUNNER.format(clip=clip, snippet=snippet)
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        runs.append(json.loads(result.stdout.strip().splitlines()[-1]))
+    return min(run["seconds"] for run in runs), runs[0]["loaded"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clip", default=SAMPLE_CLIP)
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh interpreters per measurement (best is kept).")
+    args = parser.parse_args()
+
+    for label, snippet in SNIPPETS.items():
+        seconds, loaded = measure(snippet, args.clip, args.repeat)
+        print(f"  {label:<28} {seconds * 1000:9.1f} ms   loaded: {', '.join(loaded) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 import os
 from pydub import AudioSegment
 import json
+from wav_reader import WavFile
 
 # Root directory containing multiple "studioXXX/middle" folders
 input_root = "./studio1-10"  # Update this to your actual path
@@ -28,6 +29,16 @@ def convert_flac_to_wav():
                         audio.export(output_file, format="wav")
                         print(f"Converted: {input_file} → {output_file}")
 
+# Duration in ms, rounded like len(AudioSegment); WAV files only have their header read
+def audio_duration_ms(file_path):
+    if file_path.endswith(".wav"):
+        try:
+            wav = WavFile(file_path)
+            return round(1000 * wav.frames / wav.sr)
+        except ValueError:
+            pass  # Not a plain PCM WAV, let pydub decode it
+    return len(AudioSegment.from_file(file_path))
+
 # Function to filter short audio files
 def filter_short_audio(root_dir, min_duration=1000, short_audio_dir="short_audio_files", log_file="removed_files.txt"):
     os.makedirs(short_audio_dir, exist_ok=True)
@@ -41,14 +52,14 @@ def filter_short_audio(root_dir, min_duration=1000, short_audio_dir="short_audio
             for filename in os.listdir(middle_path):
                 if filename.endswith(".wav") or filename.endswith(".mp3"):
                     file_path = os.path.join(middle_path, filename)
-                    audio = AudioSegment.from_file(file_path)
-                    
-                    if len(audio) < min_duration:
+                    duration_ms = audio_duration_ms(file_path)
+
+                    if duration_ms < min_duration:
                         os.rename(file_path, os.path.join(short_audio_dir, filename))
                         removed_files.append(filename.replace(".wav", ".flac"))  # Store as .flac format
-                        print(f"Moved: {filename} (Duration: {len(audio)} ms)")
+                        print(f"Moved: {filename} (Duration: {duration_ms} ms)")
                     else:
-                        print(f"Kept: {filename} (Duration: {len(audio)} ms)")
+                        print(f"Kept: {filename} (Duration: {duration_ms} ms)")
     
     # Save removed files list if any files were removed
     if removed_files:
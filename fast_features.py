@@ -0,0 +1,56 @@
+"""
+Pure-NumPy versions of the cheap frame features.
+
+Each function returns the same frames as its librosa counterpart with default
+settings (`librosa.feature.rms`, `zero_crossing_rate`, `spectral_centroid`),
+but frames the signal with a strided view instead of going through librosa's
+framing and validation. Selected with `extract_features(..., backend="numpy")`;
+`bench_fast_features.py` checks parity and times both.
+"""
+from utils import LazyModule
+
+np = LazyModule("numpy")
+
+FRAME_LENGTH = 2048
+HOP_LENGTH = 512
+ZERO_THRESHOLD = 1e-10  # librosa.zero_crossings treats smaller magnitudes as zero
+
+
+def frame_signal(y, frame_length=FRAME_LENGTH, hop_length=HOP_LENGTH):
+    """Returns a read-only (n_frames, frame_length) strided view of `y` without copying it."""
+    n_frames = 1 + (y.shape[-1] - frame_length) // hop_length
+    stride = y.strides[-1]
+    return np.lib.stride_tricks.as_strided(
+        y, shape=(n_frames, frame_length), strides=(hop_length * stride, stride), writeable=False
+    )
+
+
+def rms(y, frame_length=FRAME_LENGTH, hop_length=HOP_LENGTH, center=True):
+    """Per-frame root mean square, like `librosa.feature.rms(y=y)[0]`."""
+    y = np.asarray(y, dtype=np.float32)
+    if center:
+        y = np.pad(y, frame_length // 2, mode="constant")
+    frames = frame_signal(y, frame_length, hop_length)
+    return np.sqrt(np.einsum("ij,ij->i", frames, frames) / frame_length)
+
+
+def zero_crossing_rate(y, frame_length=FRAME_LENGTH, hop_length=HOP_LENGTH, center=True):
+    """Per-frame zero-crossing rate, like `librosa.feature.zero_crossing_rate(y)[0]`."""
+    if center:
+        y = np.pad(y, frame_length // 2, mode="edge")
+    #   Sign changes between neighbouring samples; zero counts as positive
+    negative = y < -ZERO_THRESHOLD
+    crossings = np.zeros(y.shape[-1], dtype=bool)
+    crossings[1:] = negative[1:] != negative[:-1]
+    #   The first sample of a frame has no neighbour inside the frame
+    frames = frame_signal(crossings, frame_length, hop_length)[:, 1:]
+    return frames.sum(axis=1, dtype=np.int64) / frame_length
+
+
+def spectral_centroid(S, sr):
+    """Per-frame spectral centroid of a magnitude spectrogram, like `librosa.feature.spectral_centroid(S=S, sr=sr)[0]`."""
+    n_fft = 2 * (S.shape[-2] - 1)
+    freq = np.fft.rfftfreq(n_fft, d=1.0 / sr)
+    norm = S.sum(axis=-2)
+    norm[norm < np.finfo(S.dtype).tiny] = 1.0  # Silent frames stay at zero
+    return (freq @ S) / norm
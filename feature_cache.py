@@ -0,0 +1,159 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from feature_config import feature_config
+
+logger = logging.getLogger(__name__)
+
+# Cache location and size budget (bytes of stored feature JSON)
+FEATURE_CACHE_PATH = os.getenv("FEATURE_CACHE_PATH", os.path.join(".cache", "features.sqlite"))
+FEATURE_CACHE_MAX_BYTES = int(os.getenv("FEATURE_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+
+class FeatureCache:
+    """
+    Content-addressed store for extracted features.
+
+    Entries are keyed by a hash of the audio bytes plus the feature settings, so
+    the same clip under a different name or path is still a hit. When the stored
+    size goes over `max_bytes`, the least recently used entries are evicted.
+    """
+
+    def __init__(self, path: str = FEATURE_CACHE_PATH, max_bytes: int = FEATURE_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        #   Shared by the bot's worker threads, so every use of the connection holds the lock
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS features ("
+            " key TEXT PRIMARY KEY,"
+            " features TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS features_last_access ON features (last_access)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(audio_bytes: bytes, config: dict) -> str:
+        """Hashes the audio content together with the feature settings."""
+        digest = hashlib.sha256(audio_bytes)
+        digest.update(json.dumps(config, sort_keys=True).encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key: str):
+        """Returns the cached features for a key, or None on a miss."""
+        with self._lock:
+            row = self._conn.execute("SELECT features FROM features WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE features SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        features = json.loads(row[0])
+        if "vectors" in features:
+            import numpy as np
+
+            features["vectors"] = {name: np.asarray(v, dtype=np.float32) for name, v in features["vectors"].items()}
+        return features
+
+    def put(self, key: str, features: dict) -> None:
+        """Stores features for a key and evicts old entries if the cache is over budget."""
+        payload = json.dumps(features, default=lambda array: array.tolist())  # Rich feature vectors
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO features (key, features, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, payload, len(payload), time.time()),
+            )
+            self._conn.commit()
+            self._evict()
+
+    def total_size(self) -> int:
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM features").fetchone()[0]
+
+    def _evict(self) -> None:
+        """Drops least recently used entries until the cache is back under 90% of its budget."""
+        total = self.total_size()
+        if total <= self.max_bytes:
+            return
+
+        target = int(self.max_bytes * 0.9)
+        evicted = 0
+        for key, size in self._conn.execute("SELECT key, size FROM features ORDER BY last_access").fetchall():
+            if total <= target:
+                break
+            self._conn.execute("DELETE FROM features WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        self._conn.commit()
+        logger.info(f"Feature cache evicted {evicted} entries ({total} bytes kept).")
+
+
+_cache = None
+
+
+def get_feature_cache() -> FeatureCache:
+    """Returns the process-wide feature cache, opening it on first use."""
+    global _cache
+    if _cache is None:
+        _cache = FeatureCache()
+    return _cache
+
+
+def cached_extract_features(file_path: str, **kwargs):
+    """
+    Same as `feature_detection.extract_features`, but returns cached features when
+    this audio was already analysed with the same settings.
+
+    A hit only reads and hashes the file; librosa is imported on a miss only.
+    """
+    with open(file_path, "rb") as audio_file:
+        audio_bytes = audio_file.read()
+
+    cache = get_feature_cache()
+    key = cache.make_key(audio_bytes, feature_config(**kwargs))
+
+    features = cache.get(key)
+    if features is not None:
+        features["filename"] = os.path.basename(file_path)
+        return features
+
+    from feature_detection import extract_features
+
+    features = extract_features(file_path, **kwargs)
+    if features is not None:
+        cache.put(key, features)
+    return features
+
+
+def cached_extract_clip_features(clip, **kwargs):
+    """
+    Cached features of an in-memory `audio_io.AudioClip`.
+
+    The key is the clip's encoded bytes (the voice note as downloaded), so a
+    forwarded or re-sent voice note is a hit before anything is decoded again.
+    """
+    cache = get_feature_cache()
+    #   ffmpeg-decoded samples differ slightly from librosa.load of the same file
+    config = dict(feature_config(**kwargs), decoder="ffmpeg", sr=clip.sr)
+    if clip.trim:
+        config["trim"] = clip.trim
+    key = cache.make_key(clip.encoded, config)
+
+    features = cache.get(key)
+    if features is not None:
+        features["filename"] = clip.name
+        return features
+
+    from feature_detection import extract_features_from_array
+
+    features = extract_features_from_array(clip.samples, clip.sr, name=clip.name, **kwargs)
+    if features is not None:
+        cache.put(key, features)
+    return features
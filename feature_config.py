@@ -0,0 +1,81 @@
+"""
+Settings that decide what `feature_detection.extract_features` returns.
+
+Kept free of heavy imports so the feature cache can build its keys without
+loading librosa or numpy.
+"""
+import os
+
+# Bump whenever extract_features output changes for the same audio and settings
+FEATURE_CONFIG_VERSION = 4
+
+# Resampling policies: name -> (analysis sample rate, librosa res_type).
+# A rate of None keeps each file at its native rate.
+RESAMPLE_POLICIES = {
+    "native": (None, None),
+    "speech": (16000, "soxr_hq"),
+    "speech_fast": (16000, "soxr_qq"),
+    "legacy": (44100, "soxr_hq"),  # How audio_features.csv was originally built
+}
+
+# Policy used by the bot, the evaluator and the CSV builder unless told otherwise.
+# 16 kHz matches the voice notes the bot receives, so they are never upsampled.
+RESAMPLE_POLICY = os.getenv("FEATURE_RESAMPLE_POLICY", "speech")
+
+# Pitch tracking: "full" runs yin on every frame, "voiced" only on frames within
+# PITCH_TOP_DB of the loudest one, keeping every PITCH_STEP-th frame and at most
+# PITCH_MAX_FRAMES per clip. See pitch_parity.py for how close the two stay.
+PITCH_MODES = ("full", "voiced")
+PITCH_MODE = os.getenv("FEATURE_PITCH_MODE", "voiced")
+PITCH_TOP_DB = float(os.getenv("FEATURE_PITCH_TOP_DB", 30.0))
+PITCH_STEP = int(os.getenv("FEATURE_PITCH_STEP", 2))
+PITCH_MAX_FRAMES = int(os.getenv("FEATURE_PITCH_MAX_FRAMES", 256))
+
+# Backend for the cheap frame features (RMS, zero-crossing rate, spectral
+# centroid): "librosa", or "numpy" for the strided versions in fast_features.py
+BACKENDS = ("librosa", "numpy")
+BACKEND = os.getenv("FEATURE_BACKEND", "numpy")
+
+# Streaming extraction reads the file (or decoded array) in blocks of STREAM_BLOCK_SIZE
+# samples and is used automatically for clips of at least STREAM_MIN_SECONDS. It returns the
+# same values as loading the whole clip, so it is not part of the cache key.
+STREAM_BLOCK_SIZE = int(os.getenv("FEATURE_STREAM_BLOCK_SIZE", 262144))
+STREAM_MIN_SECONDS = float(os.getenv("FEATURE_STREAM_MIN_SECONDS", 60.0))
+
+
+def get_resample_policy(name: str = None) -> tuple:
+    """Returns (sample rate, res_type) for a policy name, defaulting to RESAMPLE_POLICY."""
+    name = name or RESAMPLE_POLICY
+    if name not in RESAMPLE_POLICIES:
+        raise ValueError(f"Unknown resample policy '{name}'. Choose from {sorted(RESAMPLE_POLICIES)}.")
+    return RESAMPLE_POLICIES[name]
+
+
+def get_pitch_mode(name: str = None) -> str:
+    """Validates a pitch mode name, defaulting to PITCH_MODE."""
+    name = name or PITCH_MODE
+    if name not in PITCH_MODES:
+        raise ValueError(f"Unknown pitch mode '{name}'. Choose from {list(PITCH_MODES)}.")
+    return name
+
+
+def get_backend(name: str = None) -> str:
+    """Validates a frame feature backend name, defaulting to BACKEND."""
+    name = name or BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown feature backend '{name}'. Choose from {list(BACKENDS)}.")
+    return name
+
+
+def feature_config(resample_policy: str = None, pitch_mode: str = None, backend: str = None, **overrides) -> dict:
+    """Returns the effective feature settings, used to key cached features."""
+    config = {
+        "version": FEATURE_CONFIG_VERSION,
+        "resample_policy": resample_policy or RESAMPLE_POLICY,
+        "pitch_mode": get_pitch_mode(pitch_mode),
+        "backend": get_backend(backend),
+    }
+    if config["pitch_mode"] == "voiced":
+        config["pitch"] = [PITCH_TOP_DB, PITCH_STEP, PITCH_MAX_FRAMES]
+    config.update(overrides)
+    return config
@@ -0,0 +1,92 @@
+import os
+import json
+import shutil
+import numpy as np
+from feature_detection import FEATURE_COLUMNS, VECTOR_FEATURES
+
+# Scalar columns stored next to the vectors (everything in the CSV but the filename)
+SCALAR_COLUMNS = [column for column in FEATURE_COLUMNS if column != "filename"]
+INDEX_FILE = "index.json"
+
+
+class FeatureDataset:
+    """
+    Read side of a feature dataset written by `write_feature_dataset`.
+
+    Every column is its own `.npy` file, opened memory-mapped, so loading the
+    dataset only reads the small JSON index. Rows are looked up by filename.
+
+        dataset = FeatureDataset("audio_vectors")
+        dataset["s001_middle_actor001_impro1_1.wav"]["mfcc_mean"]  # shape (13,)
+        dataset.matrix(["mfcc_mean", "mfcc_std"])                  # shape (n_clips, 26)
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, INDEX_FILE), "r") as f:
+            index = json.load(f)
+        self.filenames = index["filenames"]
+        self.columns = index["columns"]  # name -> vector length (1 for scalars)
+        self._rows = {filename: i for i, filename in enumerate(self.filenames)}
+        self._arrays = {}
+
+    def __len__(self) -> int:
+        return len(self.filenames)
+
+    def __contains__(self, filename: str) -> bool:
+        return filename in self._rows
+
+    def __getitem__(self, filename: str) -> dict:
+        """Returns every column of one clip."""
+        row = self._rows[filename]
+        return {name: self.column(name)[row] for name in self.columns}
+
+    def column(self, name: str) -> np.ndarray:
+        """Returns one column for all clips as a read-only memory map."""
+        if name not in self._arrays:
+            self._arrays[name] = np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode="r")
+        return self._arrays[name]
+
+    def matrix(self, names=None) -> np.ndarray:
+        """Stacks the given columns (default: all vectors) into one (n_clips, n_values) array."""
+        names = names or list(VECTOR_FEATURES)
+        return np.hstack([self.column(name).reshape(len(self), -1) for name in names])
+
+
+def write_feature_dataset(path: str, rows) -> FeatureDataset:
+    """
+    Writes features from `extract_features(..., rich=True)` as a columnar dataset.
+
+    Rows already in a dataset at `path` are kept, and a clip written again
+    replaces its old row. The new dataset is built next to the old one and moved
+    into place at the end, so readers never see a half-written dataset.
+    """
+    rows = {row["filename"]: row for row in rows}
+    existing = FeatureDataset(path) if os.path.exists(os.path.join(path, INDEX_FILE)) else None
+    kept = [filename for filename in (existing.filenames if existing else []) if filename not in rows]
+    filenames = kept + list(rows)
+
+    columns = {name: 1 for name in SCALAR_COLUMNS}
+    columns.update(VECTOR_FEATURES)
+
+    tmp_path = f"{path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    for name, length in columns.items():
+        shape = (len(filenames),) if length == 1 else (len(filenames), length)
+        out = np.lib.format.open_memmap(os.path.join(tmp_path, f"{name}.npy"), mode="w+", dtype=np.float32, shape=shape)
+        if kept:
+            out[: len(kept)] = existing.column(name)[[existing._rows[filename] for filename in kept]]
+        for i, row in enumerate(rows.values(), start=len(kept)):
+            out[i] = row[name] if length == 1 else row["vectors"][name]
+        out.flush()
+        del out
+
+    with open(os.path.join(tmp_path, INDEX_FILE), "w") as f:
+        json.dump({"filenames": filenames, "columns": columns}, f)
+
+    if existing is not None:
+        shutil.rmtree(path)
+    os.rename(tmp_path, path)
+    return FeatureDataset(path)
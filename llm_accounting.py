@@ -0,0 +1,311 @@
+"""
+Per-call accounting of LLM requests: tokens, time to first byte, latency and cost.
+
+Each call is measured and appended to a small SQLite table:
+
+    with llm_accounting.track("prompt", "gpt-4o") as call:
+        response = await client.chat.completions.create(...)
+        call.set_response(response)
+        call.answer_type = result["answer_type"]
+
+Time to first byte comes from the shared clients' response hook (see
+llm_client), which marks the call being tracked in the current context when
+response headers arrive. Streamed calls mark it themselves with `first_byte()`.
+
+Rows are written by a background thread, so recording a call from the event
+loop never waits on SQLite.
+
+    python llm_accounting.py report --hours 24
+"""
+import os
+import time
+import queue
+import atexit
+import sqlite3
+import argparse
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+import metrics
+
+logger = logging.getLogger(__name__)
+
+LLM_ACCOUNTING = os.getenv("LLM_ACCOUNTING", "1") != "0"
+LLM_ACCOUNTING_PATH = os.getenv("LLM_ACCOUNTING_PATH", os.path.join(".cache", "llm_calls.sqlite"))
+
+# USD per 1M tokens: (prompt, completion, audio prompt); looked up by the longest matching model prefix
+MODEL_PRICES = {
+    "gpt-4o-audio-preview": (2.50, 10.00, 40.00),
+    "gpt-4o-mini": (0.15, 0.60, None),
+    "gpt-4o": (2.50, 10.00, None),
+    "gpt-4": (30.00, 60.00, None),
+}
+
+TOKENS = metrics.counter("llm_tokens_total", "LLM tokens by model and type (prompt, completion).", labels=("model", "type"))
+COST = metrics.counter("llm_cost_usd_total", "Estimated LLM spend in USD by model.", labels=("model",))
+FIRST_BYTE_SECONDS = metrics.histogram("llm_first_byte_seconds", "Time to the first response byte of LLM calls.",
+                                       labels=("source",))
+
+COLUMNS = ("ts", "source", "model", "answer_type", "ok", "prompt_tokens", "completion_tokens", "audio_tokens",
+           "ttfb_ms", "latency_ms", "cost_usd")
+
+_current = contextvars.ContextVar("llm_call", default=None)
+
+
+def model_price(model: str):
+    matches = [name for name in MODEL_PRICES if model and model.startswith(name)]
+    return MODEL_PRICES[max(matches, key=len)] if matches else None
+
+
+class CallRecord:
+    """Measurements of one LLM call; `answer_type` is filled in by the caller once the reply is parsed."""
+
+    def __init__(self, source: str, model: str, answer_type: str = None):
+        self.source, self.model, self.answer_type = source, model, answer_type
+        self.ts = time.time()
+        self.started = time.perf_counter()
+        self.ttfb = None
+        self.latency = None
+        self.ok = True
+        self.prompt_tokens = self.completion_tokens = self.audio_tokens = None
+
+    def first_byte(self) -> None:
+        if self.ttfb is None:
+            self.ttfb = time.perf_counter() - self.started
+
+    def set_usage(self, usage) -> None:
+        """Takes the token counts of an OpenAI `usage` object (absent on some streamed replies)."""
+        if usage is None:
+            return
+        self.prompt_tokens = getattr(usage, "prompt_tokens", None)
+        self.completion_tokens = getattr(usage, "completion_tokens", None)
+        details = getattr(usage, "prompt_tokens_details", None)
+        self.audio_tokens = getattr(details, "audio_tokens", None) if details is not None else None
+
+    def set_response(self, response) -> None:
+        self.set_usage(getattr(response, "usage", None))
+
+    def cost(self):
+        """Estimated USD cost from MODEL_PRICES, or None for an unknown model or missing usage."""
+        price = model_price(self.model)
+        if price is None or self.prompt_tokens is None:
+            return None
+        prompt_price, completion_price, audio_price = price
+        audio_tokens = (self.audio_tokens or 0) if audio_price is not None else 0
+        return ((self.prompt_tokens - audio_tokens) * prompt_price + audio_tokens * (audio_price or 0)
+                + (self.completion_tokens or 0) * completion_price) / 1e6
+
+    def finish(self) -> None:
+        if self.latency is None:
+            self.latency = time.perf_counter() - self.started
+
+    def row(self) -> tuple:
+        ms = lambda seconds: None if seconds is None else round(seconds * 1000, 1)
+        return (self.ts, self.source, self.model, self.answer_type, int(self.ok), self.prompt_tokens,
+                self.completion_tokens, self.audio_tokens, ms(self.ttfb), ms(self.latency), self.cost())
+
+
+class AccountingStore:
+    """Append-only SQLite table of LLM calls."""
+
+    def __init__(self, path: str = LLM_ACCOUNTING_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        #   Written from the event loop and from worker threads, so every use of the connection holds the lock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_calls ("
+            " ts REAL NOT NULL,"
+            " source TEXT NOT NULL,"
+            " model TEXT,"
+            " answer_type TEXT,"
+            " ok INTEGER NOT NULL,"
+            " prompt_tokens INTEGER,"
+            " completion_tokens INTEGER,"
+            " audio_tokens INTEGER,"
+            " ttfb_ms REAL,"
+            " latency_ms REAL,"
+            " cost_usd REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS llm_calls_ts ON llm_calls (ts)")
+        self._conn.commit()
+
+    def record(self, call: CallRecord) -> None:
+        with self._lock:
+            self._conn.execute(f"INSERT INTO llm_calls VALUES ({', '.join('?' * len(COLUMNS))})", call.row())
+            self._conn.commit()
+
+    def rows(self, since: float = 0.0) -> list:
+        """Calls made after the `since` timestamp, as dicts."""
+        with self._lock:
+            cursor = self._conn.execute(f"SELECT {', '.join(COLUMNS)} FROM llm_calls WHERE ts >= ?", (since,))
+            return [dict(zip(COLUMNS, row)) for row in cursor.fetchall()]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> AccountingStore:
+    """Returns the process-wide accounting store."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = AccountingStore()
+    return _store
+
+
+_calls = None
+_writer_lock = threading.Lock()
+
+
+def _write_calls(calls: queue.SimpleQueue) -> None:
+    """Writer thread: stores queued calls and sets queued flush events, until it gets None."""
+    while True:
+        item = calls.get()
+        if item is None:
+            return
+        if isinstance(item, threading.Event):
+            item.set()
+            continue
+        try:
+            get_store().record(item)
+        except Exception as e:
+            logger.warning(f"Could not record LLM call: {e}")
+
+
+def _stop_writer(calls: queue.SimpleQueue, writer: threading.Thread) -> None:
+    calls.put(None)
+    writer.join(timeout=5)
+
+
+def _call_queue() -> queue.SimpleQueue:
+    """Returns the queue of calls waiting to be stored, starting the writer thread on first use."""
+    global _calls
+    if _calls is None:
+        with _writer_lock:
+            if _calls is None:
+                calls = queue.SimpleQueue()
+                writer = threading.Thread(target=_write_calls, args=(calls,), name="llm-accounting", daemon=True)
+                writer.start()
+                atexit.register(_stop_writer, calls, writer)
+                _calls = calls
+    return _calls
+
+
+def flush(timeout: float = None) -> bool:
+    """Waits until the calls recorded so far are stored; returns False on timeout."""
+    done = threading.Event()
+    _call_queue().put(done)
+    return done.wait(timeout)
+
+
+def record(call: CallRecord) -> None:
+    """Finishes a call and queues it for the store; accounting problems are logged, never raised into the reply path."""
+    call.finish()
+    if call.prompt_tokens is not None:
+        TOKENS.inc(call.prompt_tokens, model=call.model, type="prompt")
+        TOKENS.inc(call.completion_tokens or 0, model=call.model, type="completion")
+    cost = call.cost()
+    if cost:
+        COST.inc(cost, model=call.model)
+    if call.ttfb is not None:
+        FIRST_BYTE_SECONDS.observe(call.ttfb, source=call.source)
+    if not LLM_ACCOUNTING:
+        return
+    _call_queue().put(call)
+
+
+@contextmanager
+def track(source: str, model: str, answer_type: str = None):
+    """Measures the LLM call made inside the block and records it on exit (as failed if the block raises)."""
+    call = CallRecord(source, model, answer_type)
+    token = _current.set(call)
+    try:
+        yield call
+    except BaseException:
+        call.ok = False
+        raise
+    finally:
+        _current.reset(token)
+        record(call)
+
+
+async def measure(source: str, model: str, fn, answer_type: str = None):
+    """Returns `await fn()`, tracked as one call with the usage of the response it returns."""
+    with track(source, model, answer_type) as call:
+        response = await fn()
+        call.set_response(response)
+    return response
+
+
+def on_response(response) -> None:
+    """httpx response hook of the synchronous client: headers arrived for the tracked call."""
+    call = _current.get()
+    if call is not None:
+        call.first_byte()
+
+
+async def on_response_async(response) -> None:
+    """httpx response hook of the async client."""
+    on_response(response)
+
+
+def percentile(values, q: float):
+    """Nearest-rank q-quantile of the non-missing values, or None."""
+    values = sorted(v for v in values if v is not None)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else None
+
+
+def summarize(rows, by: str = "answer_type") -> dict:
+    """Per-group call count, failures, p50/p95 latency, TTFB and tokens, and total cost."""
+    groups = {}
+    for row in rows:
+        groups.setdefault(row[by] or "-", []).append(row)
+    summary = {}
+    for group, calls in sorted(groups.items()):
+        column = lambda name: [call[name] for call in calls]
+        summary[group] = {
+            "calls": len(calls),
+            "failed": sum(1 for call in calls if not call["ok"]),
+            **{f"{name}_p{int(q * 100)}": percentile(column(name), q)
+               for name in ("latency_ms", "ttfb_ms", "prompt_tokens", "completion_tokens") for q in (0.5, 0.95)},
+            "cost_usd": sum(cost for cost in column("cost_usd") if cost is not None),
+        }
+    return summary
+
+
+def print_report(summary: dict, by: str) -> None:
+    header = (f"{by:<16}{'calls':>7}{'failed':>7}{'lat p50':>9}{'lat p95':>9}{'ttfb p50':>9}{'ttfb p95':>9}"
+              f"{'in p50':>8}{'in p95':>8}{'out p50':>8}{'out p95':>8}{'cost $':>10}")
+    print(header)
+    print("-" * len(header))
+    fmt = lambda value, width: f"{'-' if value is None else round(value):>{width}}"
+    for group, s in summary.items():
+        print(f"{group:<16}{s['calls']:>7}{s['failed']:>7}"
+              f"{fmt(s['latency_ms_p50'], 9)}{fmt(s['latency_ms_p95'], 9)}{fmt(s['ttfb_ms_p50'], 9)}{fmt(s['ttfb_ms_p95'], 9)}"
+              f"{fmt(s['prompt_tokens_p50'], 8)}{fmt(s['prompt_tokens_p95'], 8)}"
+              f"{fmt(s['completion_tokens_p50'], 8)}{fmt(s['completion_tokens_p95'], 8)}{s['cost_usd']:>10.4f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize recorded LLM calls (latency in ms, tokens, cost).")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    report = subparsers.add_parser("report", help="p50/p95 latency and tokens per answer type")
+    report.add_argument("--hours", type=float, default=None, help="Only calls from the last N hours")
+    report.add_argument("--by", choices=("answer_type", "model", "source"), default="answer_type")
+    report.add_argument("--path", default=LLM_ACCOUNTING_PATH)
+    args = parser.parse_args()
+
+    since = time.time() - args.hours * 3600 if args.hours else 0.0
+    rows = AccountingStore(args.path).rows(since)
+    if not rows:
+        print("No LLM calls recorded.")
+    else:
+        print_report(summarize(rows, args.by), args.by)
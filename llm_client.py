@@ -0,0 +1,110 @@
+"""
+Shared OpenAI clients for every entry point (bot, scripts, simplechat apps).
+
+Clients are built on first use and then reused, so each process keeps one
+warm, keep-alive connection pool instead of a cold one per module. HTTP/2 is
+used when the `h2` package is installed. Calls pass a timeout budget for their
+kind of request:
+
+    response = await get_async_client().chat.completions.create(..., timeout=timeout_for("audio"))
+"""
+import os
+import logging
+import threading
+import importlib.util
+import llm_accounting
+from utils import LazyModule
+
+logger = logging.getLogger(__name__)
+
+# Imported on first use, so importing this module stays cheap
+openai = LazyModule("openai")
+httpx = LazyModule("httpx")
+
+# Connection pool
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", 20))
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", 120.0))  # seconds an idle connection is kept
+OPENAI_HTTP2 = os.getenv("OPENAI_HTTP2", "1") != "0"
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", 2))
+OPENAI_ASYNC_MAX_RETRIES = int(os.getenv("OPENAI_ASYNC_MAX_RETRIES", 0))  # the bot retries through resilience.call
+
+# Timeouts (seconds): connecting, and the default budget for a whole request
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", 5.0))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", 60.0))
+
+# Per-call budgets by kind of request; streamed calls bound the wait between chunks
+TIMEOUT_BUDGETS = {
+    "chat": float(os.getenv("OPENAI_CHAT_TIMEOUT", 30.0)),
+    "audio": float(os.getenv("OPENAI_AUDIO_TIMEOUT", 90.0)),
+    "image": float(os.getenv("OPENAI_IMAGE_TIMEOUT", 120.0)),
+    "stream": float(os.getenv("OPENAI_STREAM_TIMEOUT", 20.0)),
+}
+
+_lock = threading.Lock()
+_clients = {}
+
+
+def http2_enabled() -> bool:
+    """HTTP/2 needs the optional `h2` package (pip install "httpx[http2]")."""
+    return OPENAI_HTTP2 and importlib.util.find_spec("h2") is not None
+
+
+def timeout_for(kind: str = None):
+    """Timeout for one call of the given kind ("chat", "audio", "image", "stream"), or the default budget."""
+    return httpx.Timeout(TIMEOUT_BUDGETS.get(kind, OPENAI_TIMEOUT), connect=OPENAI_CONNECT_TIMEOUT)
+
+
+def _api_key() -> str:
+    # Ensure the OpenAI API key is set
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        logger.error("OPENAI_API_KEY is not set in environment variables.")
+        raise EnvironmentError("Missing OPENAI_API_KEY.")
+    return api_key
+
+
+def _http_options(kind: str) -> dict:
+    #   Marks time to first byte of the call being tracked by llm_accounting
+    hook = llm_accounting.on_response_async if kind == "async" else llm_accounting.on_response
+    return {
+        "http2": http2_enabled(),
+        "event_hooks": {"response": [hook]},
+        "limits": httpx.Limits(
+            max_connections=OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=OPENAI_MAX_CONNECTIONS,
+            keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY,
+        ),
+        "timeout": timeout_for(),
+    }
+
+
+def _get(kind: str):
+    client = _clients.get(kind)
+    if client is None:
+        with _lock:
+            client = _clients.get(kind)
+            if client is None:
+                api_key = _api_key()
+                if kind == "async":
+                    http_client = openai.DefaultAsyncHttpxClient(**_http_options(kind))
+                    client = openai.AsyncOpenAI(
+                        api_key=api_key, http_client=http_client, timeout=timeout_for(),
+                        max_retries=OPENAI_ASYNC_MAX_RETRIES,
+                    )
+                else:
+                    http_client = openai.DefaultHttpxClient(**_http_options(kind))
+                    client = openai.OpenAI(
+                        api_key=api_key, http_client=http_client, timeout=timeout_for(), max_retries=OPENAI_MAX_RETRIES
+                    )
+                _clients[kind] = client
+    return client
+
+
+def get_client():
+    """Returns the process-wide synchronous OpenAI client, creating it on first use."""
+    return _get("sync")
+
+
+def get_async_client():
+    """Returns the process-wide AsyncOpenAI client, creating it on first use."""
+    return _get("async")
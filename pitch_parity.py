@@ -0,0 +1,78 @@
+"""
+Parity report for the voiced pitch mode.
+
+Recomputes `pitch_mean` for the clips listed in audio_features.csv with both
+pitch modes, under the 'legacy' resampling policy the CSV was built with, and
+compares voiced mode against full mode (`voiced_vs_full`), the parity measure.
+
+The CSV only supplies the clip list: its stored pitch_mean came from yin
+called without the sample rate (so it assumed 22050 Hz on 44.1 kHz audio)
+and is not comparable with either mode today.
+
+    python pitch_parity.py --output pitch_parity.json
+"""
+import os
+import csv
+import json
+import time
+import argparse
+import numpy as np
+import librosa
+from feature_detection import load_audio, voiced_pitch, PITCH_FMIN, PITCH_FMAX
+
+
+def compare(reference, estimate):
+    """Summarises how far `estimate` is from `reference`."""
+    reference, estimate = np.asarray(reference), np.asarray(estimate)
+    error = np.abs(estimate - reference)
+    return {
+        "mean_abs_error_hz": float(np.mean(error)),
+        "median_rel_error": float(np.median(error / np.abs(reference))),
+        "p95_rel_error": float(np.percentile(error / np.abs(reference), 95)),
+        "correlation": float(np.corrcoef(reference, estimate)[0, 1]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default="audio_features.csv")
+    parser.add_argument("--audio-dir", default="short_audio_files")
+    parser.add_argument("--output", help="Also write the report to this JSON file.")
+    args = parser.parse_args()
+
+    with open(args.csv, "r", newline="") as f:
+        filenames = [
+            row["filename"]
+            for row in csv.DictReader(f)
+            if os.path.exists(os.path.join(args.audio_dir, row["filename"]))
+        ]
+    if not filenames:
+        raise SystemExit(f"None of the clips in {args.csv} were found in {args.audio_dir}")
+
+    clips = [load_audio(os.path.join(args.audio_dir, filename), "legacy") for filename in filenames]
+    voiced_pitch(*clips[0])  # Warm up numba before timing
+
+    start = time.perf_counter()
+    full = [float(np.mean(librosa.yin(y, sr=sr, fmin=PITCH_FMIN, fmax=PITCH_FMAX))) for y, sr in clips]
+    full_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    voiced = [float(np.nan_to_num(np.mean(voiced_pitch(y, sr)))) for y, sr in clips]
+    voiced_seconds = time.perf_counter() - start
+
+    report = {
+        "clips": len(clips),
+        "full_seconds": full_seconds,
+        "voiced_seconds": voiced_seconds,
+        "speedup": full_seconds / voiced_seconds,
+        "voiced_vs_full": compare(full, voiced),
+    }
+
+    print(json.dumps(report, indent=4))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,282 +1,366 @@
 import os
 import json
+import asyncio
 import logging
-from openai import OpenAI
 import re
+import time
 import base64
-from feature_detection import extract_features
+import metrics
+import resilience
+import llm_accounting
+from llm_client import get_async_client, timeout_for
+from feature_cache import cached_extract_features, cached_extract_clip_features
+from response_cache import get_response_cache, normalize_text
+from semantic_cache import get_semantic_cache
+from sentiment_router import get_router, local_answer, log_llm_answer
+from singleflight import SingleFlight
 
 # Logging configuration
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# OpenAI client initialization
-client = OpenAI()
 
-# Ensure the OpenAI API key is set
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    logger.error("OPENAI_API_KEY is not set in environment variables.")
-    raise EnvironmentError("Missing OPENAI_API_KEY.")
+def warm_up() -> None:
+    """Creates the OpenAI client now, so a missing key fails at startup instead of on the first message."""
+    get_async_client()
 
-client.api_key = OPENAI_API_KEY
 
 # Default images for fallback
 DEFAULT_CARD_IMAGE = "https://example.com/default_card.png"
 DEFAULT_MEME_IMAGE = "https://media1.giphy.com/media/hECJDGJs4hQjjWLqRV/giphy.gif?cid=6c09b952gwxhe22lcif92104ht5gph5qu62jbs7acqq8o4p9&ep=v1_gifs_search&rid=giphy.gif&ct=g"
 
 
-async def analyze_user_input(user_input: str) -> dict:
+# Tarot card images by Major Arcana number ("0", "I", ... "XXI"), from uploaded_files.json
+CARD_IMAGES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "uploaded_files.json")
+MAJOR_ARCANA = {
+    "0": "The Fool", "I": "The Magician", "II": "The High Priestess", "III": "The Empress",
+    "IV": "The Emperor", "V": "The Hierophant", "VI": "The Lovers", "VII": "The Chariot",
+    "VIII": "Strength", "IX": "The Hermit", "X": "Wheel of Fortune", "XI": "Justice",
+    "XII": "The Hanged Man", "XIII": "Death", "XIV": "Temperance", "XV": "The Devil",
+    "XVI": "The Tower", "XVII": "The Star", "XVIII": "The Moon", "XIX": "The Sun",
+    "XX": "Judgement", "XXI": "The World",
+}
+
+with open(CARD_IMAGES_FILE, "r") as f:
+    CARD_IMAGES = {os.path.splitext(name)[0]: url for name, url in json.load(f).items()}
+
+#   The model only names a card; its image URL is looked up here, so the prompt carries no URLs
+TAROT_SYSTEM_PROMPT = (
+    "Analyze the sentiment of the user's message (positive, negative or neutral). The input is mostly Thai; "
+    "reply in the language of the input. Choose exactly one answer_type:\n"
+    "- chit-chat: sentiment is neutral or negative and the context suggests conversation. "
+    "response.text engages the user.\n"
+    "- card: the sentiment shows a clear positive emotional direction. Pick a Major Arcana card as response.card; "
+    "response.text briefly describes the card in light of the sentiment, then engages the user.\n"
+    "- meme: the sentiment suggests humor or light-heartedness. response.image_link is a GIF meme link that "
+    "exists on the internet and opens in Telegram.\n"
+    "Write answer_type before response."
+)
+
+TAROT_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "sentiment",
+        "strict": False,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "answer_type": {"type": "string", "enum": ["card", "chit-chat", "meme"]},
+                "response": {
+                    "type": "object",
+                    "properties": {
+                        "text": {"type": "string"},
+                        "card": {
+                            "type": "string",
+                            "enum": [card for card in MAJOR_ARCANA if card in CARD_IMAGES],
+                            "description": ", ".join(f"{card} {name}" for card, name in MAJOR_ARCANA.items()),
+                        },
+                        "image_link": {"type": "string", "description": "Meme GIF link (meme only)."},
+                    },
+                },
+            },
+            "required": ["answer_type", "response"],
+        },
+    },
+}
+
+
+# Fields picked out of a partly streamed reply
+ANSWER_TYPE_FIELD = re.compile(r'"answer_type"\s*:\s*"([^"]+)"')
+TEXT_FIELD = re.compile(r'"text"\s*:\s*"')
+
+STREAM_FIRST_TEXT = metrics.histogram(
+    "chat_stream_first_text_seconds", "Time from sending a streamed request to the first reply text."
+)
+
+
+# Identical messages arriving together (a broadcast, a group chat) share one completion
+_model_calls = SingleFlight("chat")
+
+
+def model_error(error: Exception) -> dict:
+    """The error answer for a failed model call; a busy upstream gets its own message."""
+    if isinstance(error, (resilience.CircuitOpenError, asyncio.TimeoutError)):
+        return {"error": "The cards are busy right now. Please try again in a minute."}
+    return {"error": "An error occurred while processing your input. Please try again."}
+
+
+def resolve_card_image(result: dict) -> dict:
+    """Fills `response.image_link` of a card answer from the card number the model picked."""
+    if result.get("answer_type") == "card":
+        response = result.setdefault("response", {})
+        card = str(response.get("card", "")).strip()
+        if card not in CARD_IMAGES:
+            logger.warning(f"Model returned unknown tarot card {card!r}; using the default image.")
+        response["image_link"] = CARD_IMAGES.get(card, DEFAULT_CARD_IMAGE)
+    return result
+
+
+async def analyze_user_input(user_input: str, fast_path: bool = True) -> dict:
     print("=========user_input=========", user_input)
     """
     Analyzes user input and generates a response using the OpenAI API.
 
     Args:
         user_input (str): The user's input message.
+        fast_path (bool): Let the local router answer obvious small talk and laughter without the LLM.
 
     Returns:
         dict: A dictionary containing the response type and content, or an error message.
     """
+    local = await _answer_locally(user_input, fast_path)
+    if local is not None:
+        return local
+
+    return await _model_calls.do(_flight_key(user_input), lambda: _ask_and_remember(user_input))
+
+
+async def stream_user_input(user_input: str, fast_path: bool = True):
+    """
+    Streaming version of `analyze_user_input`, for showing a reply while it is written.
+
+    Yields ("answer_type", type) as soon as the model has written that field
+    (it comes first in the response schema), then ("text", text so far) while a
+    chit-chat reply is generated, and finally ("done", result) with the same
+    dict `analyze_user_input` returns.
+    """
+    local = await _answer_locally(user_input, fast_path)
+    if local is not None:
+        if "answer_type" in local:
+            yield "answer_type", local["answer_type"]
+        yield "done", local
+        return
+
+    key = _flight_key(user_input)
+    future, leader = _model_calls.claim(key)
+    if not leader:
+        #   The same message is already with the model; wait for that answer instead of streaming another
+        result = await _model_calls.do(key, lambda: _ask_and_remember(user_input))
+        if "answer_type" in result:
+            yield "answer_type", result["answer_type"]
+        yield "done", result
+        return
+
+    start = time.perf_counter()
+    buffer, answer_type, text, result = "", None, "", None
+    request = _completion_request(user_input)
+    call = llm_accounting.CallRecord("prompt", request["model"])
+    reply_end = time.monotonic() + resilience.DEADLINES["stream_reply"]
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {
-                    "role": "system",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": """
-                            {
-                                "name": "Predict Tarot Card from Text Sentiment",
-                                "description": "This system analyzes the sentiment of the input text and predicts a tarot card, initiates a conversation, or generates a meme based on the sentiment and context. The input might mostly be in Thai, so responses should match the input language.",
-                                "steps": [
-                                    {
-                                    "step": "Sentiment Analysis",
-                                    "action": "Analyze the sentiment of the given text (positive, negative, neutral) using text analysis techniques. The input might mostly be in Thai."
-                                    },
-                                    {
-                                    "step": "Determine Response Type",
-                                    "action": "Based on the sentiment and context, decide the response type: tarot card prediction, conversational response, or meme suggestion. Need to select only one answer type; do not return an array."
-                                    },
-                                    {
-                                    "step": "Tarot Card Selection",
-                                    "action": "If the answer type is 'card', select a random tarot card from the Major Arcana (0-XXI) and return an image from the provided list.",
-                                    "images": [
-                                        {
-                                            "name": "XIV.jpg",
-                                            "url": "https://res.cloudinary.com/dy0x2zlmm/image/upload/v1734619434/vahjqteh7yv41kgo58bq.jpg"
-                                        },
-                                        {
-                                            "name": "III.jpg",
-                                            "url": "https://res.cloudinary.com/dy0x2zlmm/image/upload/v1734619436/cx1rxypkzo8r9obzgcu2.jpg"
-                                        },
-                                        {
-                                            "name": "I.jpg",
-                                            "url": "https://res.cloudinary.com/dy0x2zlmm/image/upload/v1734619436/ylvr8vjpl09grcpjufob.jpg"
-                                        },
-                                        {
-                                            "name": "VI.jpg",
-                                            "url": "https://res.cloudinary.com/dy0x2zlmm/image/upload/v1734619437/o4rzusteygd4twzygcal.jpg"
-                                        },
-                                        {
-                                            "name": "VII.jpg",
-                                            "url": "https://res.cloudinary.com/dy0x2zlmm/image/upload/v1734619439/tlfum4e37hcozutsxvxl.jpg"
-                                        },
-                                        {
-                                            "name": "XV.jpg",
-                                            "url": "https://res.cloudinary.com/dy0x2zlmm/image/upload/v1734619439/dtdi8rcywfgzdsukz4jk.jpg"
-                                        },
-                                        {
-                                            "name": "X.jpg",
-                                            "url": "https://res.cloudinary.com/dy0x2zlmm/image/upload/v1734619440/k5cafz3xi9z7wfywpqba.jpg"
-                                        },
-                                        {
-                                            "name": "XIII.jpg",
-                                            "url": "https://res.cloudinary.com/dy0x2zlmm/image/upload/v1734619442/rmzqttnjtyezvpdwtze1.jpg"
-                                        },
-                                        {
-                                            "name": "IX.jpg",
-                                            "url": "https://res.cloudinary.com/dy0x2zlmm/image/upload/v1734619443/vb90e7jbmljqawr0qsdz.jpg"
-                                        },
-                                        {
-                                            "name": "XXI.jpg",
-                                            "url": "https://res.cloudinary.com/dy0x2zlmm/image/upload/v1734619443/xsxjtvymqnlid7mfqvgq.jpg"
-                                        },
-                                        {
-                                            "name": "II.jpg",
-                                            "url": "https://res.cloudinary.com/dy0x2zlmm/image/upload/v1734619445/xcxbhpptmfeool6xubpn.jpg"
-                                        },
-                                        {
-                                            "name": "XVIII.jpg",
-                                            "url": "https://res.cloudinary.com/dy0x2zlmm/image/upload/v1734619446/gapo7gqqpmppppfm39wp.jpg"
-                                        },
-                                        {
-                                            "name": "XVII.jpg",
-                                            "url": "https://res.cloudinary.com/dy0x2zlmm/image/upload/v1734619447/sm8oeyjm58w283uyxkju.jpg"
-                                        },
-                                        {
-                                            "name": "VIII.jpg",
-                                            "url": "https://res.cloudinary.com/dy0x2zlmm/image/upload/v1734619448/ybutnri9i1x8sgopor7b.jpg"
-                                        },
-                                        {
-                                            "name": "XVI.jpg",
-                                            "url": "https://res.cloudinary.com/dy0x2zlmm/image/upload/v1734619449/onifs9cuzhfalmxya3qw.jpg"
-                                        },
-                                        {
-                                            "name": "IV.jpg",
-                                            "url": "https://res.cloudinary.com/dy0x2zlmm/image/upload/v1734619450/vpw9dkvtf6iupjimfx5m.jpg"
-                                        },
-                                        {
-                                            "name": "XII.jpg",
-                                            "url": "https://res.cloudinary.com/dy0x2zlmm/image/upload/v1734619451/okjurztgfssnrqaxniyi.jpg"
-                                        },
-                                        {
-                                            "name": "V.jpg",
-                                            "url": "https://res.cloudinary.com/dy0x2zlmm/image/upload/v1734619453/fx66qkbq5xplbxopthyd.jpg"
-                                        },
-                                        {
-                                            "name": "XX.jpg",
-                                            "url": "https://res.cloudinary.com/dy0x2zlmm/image/upload/v1734619454/jx8age5z8ag80g5l78mp.jpg"
-                                        },
-                                        {
-                                            "name": "XIX.jpg",
-                                            "url": "https://res.cloudinary.com/dy0x2zlmm/image/upload/v1734619455/k5qcy8vfjkddory2ze5i.jpg"
-                                        },
-                                        {
-                                            "name": "XI.jpg",
-                                            "url": "https://res.cloudinary.com/dy0x2zlmm/image/upload/v1734619456/w6kivdlgq5frgmwxnjta.jpg"
-                                        },
-                                        {
-                                            "name": "0.jpg",
-                                            "url": "https://res.cloudinary.com/dy0x2zlmm/image/upload/v1734619457/q0ijgklymbjpp3efplna.jpg"
-                                        }
-                                    ]
-                                    },
-                                    ",
-                                        "conditions": [
-                                            {
-                                            "condition": "If sentiment is neutral or negative and context suggests conversation",
-                                            "response": {
-                                                "answer_type": "chit-chat",
-                                                "response": {
-                                                "text": "Provide a conversational response to engage the user."
-                                                }
-                                            }
-                                            },
-                                            {
-                                            "condition": "If sentiment analysis indicates a clear emotional direction positive ",
-                                            "response": {
-                                                "answer_type": "card",
-                                                "response": {
-                                                "image_link": "<appropriate_tarot_card_image>.png",
-                                                "text": "Provide provide a brief description of the card based on sentiment and then engage the user in a conversation."
-                                                }
-                                            }
-                                            },
-                                            {
-                                            "condition": "If sentiment suggests humor or light-heartedness",
-                                            "response": {
-                                                "answer_type": "meme",
-                                                "response": {
-                                                "image_link": "Provide gif meme link that existing in internext base on user sentimental make sure it can open in telegram."
-                                                }
-                                            }
-                                            }
-                                        ]
-                                        },
-                                        {
-                                        "step": "Generate Response",
-                                        "action": "Return the generated response based on the determined response type."
-                                        }
-                                    ]
-                                    }
-
-                                    """
-                                    
-                        }
-                    ],
-                },
-                {"role": "user", "content": [{"type": "text", "text": user_input}]},
-            ],
-            response_format={
-                "type": "json_schema",
-                "json_schema": {
-                    "name": "sentiment",
-                    "strict": False,
-                    "schema": {
-                        "$schema": "http://json-schema.org/draft-07/schema#",
-                        "type": "object",
-                        "properties": {
-                            "answer_type": {
-                                "type": "string",
-                                "enum": ["card", "chit-chat", "meme"],
-                                "description": "The type of response based on sentiment and context analysis."
-                            },
-                            "response": {
-                                "type": "object",
-                                "properties": {
-                                    "text": {
-                                        "type": "string",
-                                        "description": "The conversational response text, required if 'answer_type' is 'chit-chat' or 'card'."
-                                    },
-                                    "image_link": {
-                                        "type": "string",
-                                        "format": "uri",
-                                        "description": "The link to an image, required if 'answer_type' is 'card' or 'meme'."
-                                    }
-                                },
-                                "required": ["text"],
-                                "anyOf": [
-                                    {"required": ["text"]},
-                                    {"required": ["image_link"]}
-                                ]
-                            }
-                        },
-                        "required": ["answer_type", "response"]
-                    }
-                }
-            },
-            temperature=1,
-            max_completion_tokens=2048,
-            top_p=1,
-            frequency_penalty=0,
-            presence_penalty=0,
-        )
+        try:
+            #   Retried only until the stream opens; text already shown is not asked for again
+            stream = await resilience.call("stream", lambda: get_async_client().chat.completions.create(
+                **request, stream=True, stream_options={"include_usage": True}, timeout=timeout_for("stream")
+            ))
+            call.first_byte()
+            async for chunk in resilience.bounded_stream("stream", stream, reply_end - time.monotonic()):
+                call.set_usage(getattr(chunk, "usage", None))  # Sent with the last chunk
+                if not chunk.choices or not chunk.choices[0].delta or not chunk.choices[0].delta.content:
+                    continue
+                buffer += chunk.choices[0].delta.content
 
-        print("=========response=========", response)
+                if answer_type is None:
+                    match = ANSWER_TYPE_FIELD.search(buffer)
+                    if match:
+                        answer_type = match.group(1)
+                        yield "answer_type", answer_type
+                if answer_type == "chit-chat":
+                    partial = partial_json_string(buffer, TEXT_FIELD)
+                    if partial and partial != text:
+                        if not text:
+                            STREAM_FIRST_TEXT.observe(time.perf_counter() - start)
+                        text = partial
+                        yield "text", text
 
-        # Parse the assistant's response
-        assistant_reply = response.choices[0].message.content
-        print("=========assistant_reply=========", assistant_reply)
-        return json.loads(assistant_reply)
+            logger.debug(f"Assistant Reply: {buffer}")
+            result = resolve_card_image(json.loads(buffer))
+        except Exception as e:
+            logger.error(f"Error processing OpenAI response: {e!r}")
+            result = model_error(e)
+
+        await _remember_answer(user_input, result)
+    finally:
+        #   Left as None if the reader stopped early; waiting callers then ask the model themselves
+        _model_calls.release(key, future, result)
+        call.ok = result is not None and "error" not in result
+        call.answer_type = answer_type
+        llm_accounting.record(call)
+    yield "done", result
+
+
+def partial_json_string(buffer: str, field) -> str:
+    """
+    Decodes as much of a JSON string value as has arrived, e.g. the "text"
+    field of a half-streamed reply. Returns "" if the value has not started.
+    """
+    match = field.search(buffer)
+    if not match:
+        return ""
+    i, end = match.end(), len(buffer)
+    cut = end
+    while i < end:
+        ch = buffer[i]
+        if ch == '"':
+            cut = i
+            break
+        if ch == "\\":
+            step = 6 if buffer[i + 1:i + 2] == "u" else 2
+            if i + step > end:
+                cut = i  # Escape sequence not complete yet
+                break
+            i += step
+            continue
+        i += 1
+    try:
+        return json.loads('"' + buffer[match.end():cut] + '"')
+    except json.JSONDecodeError:
+        return ""
+
+
+async def _answer_locally(user_input: str, fast_path: bool):
+    """Answer from the caches or the local router, or None when the model has to be asked."""
+    #   Repeated greetings and small talk are answered from the caches
+    cached = await get_response_cache().aget(user_input)
+    if cached is not None:
+        return cached
+
+    if fast_path:
+        decision = get_router().route(user_input)
+        if decision.route != "llm":
+            return local_answer(user_input, decision, DEFAULT_MEME_IMAGE)
+
+    semantic_cache = get_semantic_cache()
+    similar = semantic_cache.get(user_input)
+    if similar is not None:
+        if semantic_cache.should_audit():
+            task = asyncio.create_task(_audit_similar_answer(user_input, similar))
+            _audit_tasks.add(task)
+            task.add_done_callback(_audit_tasks.discard)
+        return similar
+    return None
+
+
+def _flight_key(user_input: str) -> str:
+    return normalize_text(user_input) or user_input
+
+
+async def _ask_and_remember(user_input: str) -> dict:
+    result = await _ask_model(user_input)
+    await _remember_answer(user_input, result)
+    return result
+
+
+async def _remember_answer(user_input: str, result: dict) -> None:
+    """Keeps a fresh model answer for the caches and the router's training log."""
+    log_llm_answer(user_input, result)
+    await get_response_cache().aput(user_input, result)
+    get_semantic_cache().put(user_input, result)
+
+
+# Background audits of near-duplicate hits (referenced here so they are not garbage collected)
+_audit_tasks = set()
+
+
+async def _audit_similar_answer(user_input: str, cached: dict) -> None:
+    """Asks the model anyway and counts the near-duplicate hit as false if it picks another answer type."""
+    fresh = await _ask_model(user_input)
+    if get_semantic_cache().record_audit(cached, fresh):
+        logger.info(f"Near-duplicate cache false hit for {user_input!r}: {cached.get('answer_type')} vs {fresh.get('answer_type')}")
+
+
+def _completion_request(user_input: str) -> dict:
+    """Arguments of the tarot/chit-chat/meme completion for one message."""
+    return dict(
+        model="gpt-4o",
+        messages=[
+            {"role": "system", "content": [{"type": "text", "text": TAROT_SYSTEM_PROMPT}]},
+            {"role": "user", "content": [{"type": "text", "text": user_input}]},
+        ],
+        response_format=TAROT_RESPONSE_FORMAT,
+        temperature=1,
+        max_completion_tokens=2048,
+        top_p=1,
+        frequency_penalty=0,
+        presence_penalty=0,
+    )
+
+
+async def _ask_model(user_input: str) -> dict:
+    """One tarot/chit-chat/meme completion for a message, with the card image resolved."""
+    request = _completion_request(user_input)
+    try:
+        with llm_accounting.track("prompt", request["model"]) as call:
+            response = await resilience.call("chat", lambda: get_async_client().chat.completions.create(
+                **request, timeout=timeout_for("chat")
+            ))
+            call.set_response(response)
+            logger.debug(f"Raw API Response: {response}")
+
+            # Parse the assistant's response
+            assistant_reply = response.choices[0].message.content
+            print("=========assistant_reply=========", assistant_reply)
+            result = resolve_card_image(json.loads(assistant_reply))
+            call.answer_type = result.get("answer_type")
+        return result
 
     except Exception as e:
-        logger.error(f"Error processing OpenAI response: {e}")
-        return {
-            "error": "An error occurred while processing your input. Please try again."
-        }
+        logger.error(f"Error processing OpenAI response: {e!r}")
+        return model_error(e)
+
 
+async def analyze_user_audio_input(audio) -> dict:
+    """
+    Processes a single audio clip asynchronously by transcribing and detecting emotions.
 
-async def analyze_user_audio_input(audio_file_path: str) -> dict:
-    """Processes a single audio file asynchronously by transcribing and detecting emotions."""
+    `audio` is a path to a WAV file or an `audio_io.AudioClip` decoded in memory.
+    """
+    audio_file_path = getattr(audio, "name", audio)
     try:
         #   Extract features
-        features = extract_features(audio_file_path)
+        #   Feature extraction is CPU-bound, so it runs off the event loop
+        if isinstance(audio, str):
+            features = await asyncio.to_thread(cached_extract_features, audio)
+        else:
+            features = await asyncio.to_thread(cached_extract_clip_features, audio)
         if not features:
             logger.error(f"Feature extraction failed for {audio_file_path}")
             return {"error": "Feature extraction failed."}
         print(f"  Features extracted is {features}")
 
-        #   Read and encode audio file in base64
-        with open(audio_file_path, "rb") as audio_file:
-            audio_data = base64.b64encode(audio_file.read()).decode("utf-8")
+        #   Read and encode audio in base64
+        if isinstance(audio, str):
+            with open(audio, "rb") as audio_file:
+                wav_bytes = audio_file.read()
+        else:
+            wav_bytes = audio.wav_bytes()
+        audio_data = base64.b64encode(wav_bytes).decode("utf-8")
 
         #   Prepare feature data as a string
         feature_text = json.dumps(features, indent=2)
 
-        response = client.chat.completions.create(
+        response = await llm_accounting.measure("prompt", "gpt-4o-audio-preview", lambda: resilience.call("audio", lambda: get_async_client().chat.completions.create(
             model="gpt-4o-audio-preview",
+            timeout=timeout_for("audio"),
             messages=[
                 {
                     "role": "system",
@@ -326,10 +410,10 @@ async def analyze_user_audio_input(audio_file_path: str) -> dict:
             modalities=["text"],
             temperature=1,
             max_completion_tokens=2048
-        )
+        )), answer_type="audio")
 
         #   Log raw response for debugging
-        logger.info(f"Raw API Response: {response}")
+        logger.debug(f"Raw API Response: {response}")
 
         #   Check if response contains expected data
         if not response.choices or not response.choices[0].message:
@@ -353,6 +437,9 @@ async def analyze_user_audio_input(audio_file_path: str) -> dict:
     except json.JSONDecodeError as e:
         logger.error(f"JSON parsing error. Response was: {assistant_reply}")
         return {"error": "Failed to parse API response.", "response_text": assistant_reply}
+    except (resilience.CircuitOpenError, asyncio.TimeoutError) as e:
+        logger.error(f"OpenAI call for {audio_file_path} gave up: {e!r}")
+        return model_error(e)
     except Exception as e:
         logger.error(f"Error processing OpenAI response for {audio_file_path}: {e}")
         return {"error": "An unexpected error occurred."}  
@@ -0,0 +1,291 @@
+"""
+Deadlines, retries, hedging and circuit breaking for the bot's OpenAI calls.
+
+Every completion goes through `call(kind, fn)`, where `fn` starts one attempt:
+
+    response = await resilience.call("chat", lambda: client.chat.completions.create(...))
+
+- The whole call, retries included, must finish within the deadline for its kind.
+- Rate limits (429), server errors (5xx), timeouts and dropped connections are
+  retried with jittered exponential backoff, honouring Retry-After.
+- With LLM_HEDGE=1, a second attempt starts when the first has taken longer
+  than the recent p95 latency, and whichever answers first is used.
+- `bounded_stream` reads an opened stream under the deadline for the whole
+  reply, so a stream that opens and then trickles is cut off too.
+- After LLM_BREAKER_FAILURES consecutive upstream failures the circuit opens and
+  calls fail at once with CircuitOpenError for LLM_BREAKER_RESET seconds; then
+  one trial call decides whether it closes again.
+
+The OpenAI SDK's own retries are turned off for the async client (see
+llm_client), so attempts are not multiplied.
+"""
+import os
+import time
+import random
+import asyncio
+import logging
+import threading
+from collections import deque
+import metrics
+from llm_client import openai
+
+logger = logging.getLogger(__name__)
+
+# Deadline (seconds) for a whole call by kind of request, retries and hedges included
+DEADLINES = {
+    "chat": float(os.getenv("LLM_CHAT_DEADLINE", 20.0)),
+    "audio": float(os.getenv("LLM_AUDIO_DEADLINE", 60.0)),
+    "stream": float(os.getenv("LLM_STREAM_DEADLINE", 10.0)),  # until the stream opens
+    "stream_reply": float(os.getenv("LLM_STREAM_REPLY_DEADLINE", 30.0)),  # the whole streamed reply, see bounded_stream
+}
+DEFAULT_DEADLINE = float(os.getenv("LLM_DEADLINE", 30.0))
+
+# Retries: full-jitter exponential backoff
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", 2))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", 0.5))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", 8.0))
+
+# Hedging: off by default, since a hedged attempt is paid for twice
+LLM_HEDGE = os.getenv("LLM_HEDGE", "0") != "0"
+LLM_HEDGE_QUANTILE = float(os.getenv("LLM_HEDGE_QUANTILE", 0.95))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", 20))  # latencies needed before hedging starts
+LATENCY_WINDOW = 200
+
+# Circuit breaker
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", 5))
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", 30.0))
+
+CALL_SECONDS = metrics.histogram("llm_call_seconds", "Duration of resilient LLM calls, retries included.", labels=("kind",))
+ATTEMPTS = metrics.counter(
+    "llm_attempts_total", "LLM call attempts by outcome (ok, retryable, error, timeout).", labels=("kind", "outcome")
+)
+RETRIES = metrics.counter("llm_retries_total", "LLM attempts retried after a retryable failure.", labels=("kind",))
+HEDGES = metrics.counter("llm_hedges_total", "Hedged LLM attempts by winner (primary, hedge).", labels=("kind", "winner"))
+BREAKER_EVENTS = metrics.counter(
+    "llm_circuit_events_total", "Circuit breaker events (opened, closed, rejected).", labels=("kind", "event")
+)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling upstream while the circuit for a kind of call is open."""
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Rate limits, server errors, timeouts and connection failures; not bad requests or auth errors."""
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError)):
+        return True
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    return isinstance(error, openai.APIConnectionError)
+
+
+def retry_after(error: BaseException):
+    """Seconds the server asked us to wait (Retry-After header), or None."""
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def backoff(attempt: int) -> float:
+    return random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """Closed -> open after `failures` consecutive upstream failures -> one trial call after `reset` seconds."""
+
+    def __init__(self, kind: str, failures: int = LLM_BREAKER_FAILURES, reset: float = LLM_BREAKER_RESET):
+        self.kind = kind
+        self.failures = failures
+        self.reset = reset
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() >= self.opened_at + self.reset else "open"
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream now; in half-open state only one trial call at a time."""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self.trial_running:
+                self.trial_running = True
+                return True
+        BREAKER_EVENTS.inc(kind=self.kind, event="rejected")
+        return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.opened_at is not None:
+                BREAKER_EVENTS.inc(kind=self.kind, event="closed")
+                logger.info(f"Circuit for {self.kind} calls closed")
+            self.consecutive_failures, self.opened_at, self.trial_running = 0, None, False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.trial_running or (self.opened_at is None and self.consecutive_failures >= self.failures):
+                if self.opened_at is None:
+                    BREAKER_EVENTS.inc(kind=self.kind, event="opened")
+                    logger.warning(f"Circuit for {self.kind} calls opened after {self.consecutive_failures} failures")
+                self.opened_at, self.trial_running = time.monotonic(), False
+
+    def release_trial(self) -> None:
+        """Frees the trial slot when the trial call ended without telling us anything (e.g. it was cancelled)."""
+        with self._lock:
+            self.trial_running = False
+
+
+class LatencyTracker:
+    """Recent successful attempt latencies, for the hedging threshold."""
+
+    def __init__(self, size: int = LATENCY_WINDOW):
+        self._samples = deque(maxlen=size)
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def quantile(self, q: float):
+        """The q-quantile of recent latencies, or None until there are enough samples."""
+        if len(self._samples) < LLM_HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+_breakers = {}
+_latencies = {}
+
+
+def get_breaker(kind: str) -> CircuitBreaker:
+    if kind not in _breakers:
+        _breakers[kind] = CircuitBreaker(kind)
+    return _breakers[kind]
+
+
+def _latency(kind: str) -> LatencyTracker:
+    if kind not in _latencies:
+        _latencies[kind] = LatencyTracker()
+    return _latencies[kind]
+
+
+async def _attempt(kind: str, fn, timeout: float):
+    """One upstream attempt, cut off at `timeout` seconds."""
+    start = time.monotonic()
+    try:
+        result = await asyncio.wait_for(fn(), timeout)
+    except asyncio.TimeoutError:
+        ATTEMPTS.inc(kind=kind, outcome="timeout")
+        raise
+    except Exception as e:
+        ATTEMPTS.inc(kind=kind, outcome="retryable" if is_retryable(e) else "error")
+        raise
+    ATTEMPTS.inc(kind=kind, outcome="ok")
+    _latency(kind).add(time.monotonic() - start)
+    return result
+
+
+async def _hedged_attempt(kind: str, fn, timeout: float, hedge_after: float):
+    """Starts a second attempt if the first is still running after `hedge_after` seconds; the first to succeed wins."""
+    deadline = time.monotonic() + timeout
+    primary = asyncio.ensure_future(_attempt(kind, fn, timeout))
+    pending = {primary}
+    try:
+        done, _ = await asyncio.wait(pending, timeout=hedge_after)
+        if done:
+            return primary.result()
+
+        hedge = asyncio.ensure_future(_attempt(kind, fn, max(deadline - time.monotonic(), 0.001)))
+        names = {primary: "primary", hedge: "hedge"}
+        pending.add(hedge)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    HEDGES.inc(kind=kind, winner=names[task])
+                    return task.result()
+        #   Both failed; report the primary's error
+        return primary.result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def call(kind: str, fn, deadline: float = None, hedge: bool = None):
+    """
+    Runs `await fn()` with the deadline, retries, hedging and circuit breaker for `kind`.
+
+    Raises CircuitOpenError when the circuit is open, asyncio.TimeoutError when the
+    deadline is spent, or the last upstream error.
+    """
+    deadline = DEADLINES.get(kind, DEFAULT_DEADLINE) if deadline is None else deadline
+    hedge = LLM_HEDGE if hedge is None else hedge
+    breaker = get_breaker(kind)
+    start = time.monotonic()
+    end = start + deadline
+
+    try:
+        for attempt in range(LLM_RETRIES + 1):
+            if not breaker.allow():
+                raise CircuitOpenError(f"{kind} calls are failing upstream; circuit is {breaker.state}")
+            remaining = end - time.monotonic()
+            hedge_after = _latency(kind).quantile(LLM_HEDGE_QUANTILE) if hedge else None
+            try:
+                if hedge_after is not None and hedge_after < remaining:
+                    result = await _hedged_attempt(kind, fn, remaining, hedge_after)
+                else:
+                    result = await _attempt(kind, fn, remaining)
+            except asyncio.CancelledError:
+                breaker.release_trial()
+                raise
+            except Exception as e:
+                if not is_retryable(e):
+                    breaker.release_trial()  # The request was bad, upstream is not to blame
+                    raise
+                breaker.record_failure()
+                delay = retry_after(e) or backoff(attempt)
+                if attempt == LLM_RETRIES or time.monotonic() + delay >= end:
+                    raise
+                logger.warning(f"{kind} call failed ({type(e).__name__}: {e}); retrying in {delay:.2f}s")
+                RETRIES.inc(kind=kind)
+                await asyncio.sleep(delay)
+                continue
+            breaker.record_success()
+            return result
+    finally:
+        CALL_SECONDS.observe(time.monotonic() - start, kind=kind)
+
+
+async def bounded_stream(kind: str, stream, deadline: float):
+    """
+    Yields the chunks of an opened stream until `deadline` seconds from now.
+
+    An overrun closes the stream, counts as an upstream failure for the breaker
+    of `kind` and raises asyncio.TimeoutError. Only the wait for each chunk is
+    timed out, so nothing is cancelled while the caller handles a chunk.
+    """
+    end = time.monotonic() + deadline
+    chunks = stream.__aiter__()
+    while True:
+        try:
+            chunk = await asyncio.wait_for(chunks.__anext__(), max(end - time.monotonic(), 0))
+        except StopAsyncIteration:
+            return
+        except asyncio.TimeoutError:
+            ATTEMPTS.inc(kind=kind, outcome="timeout")
+            get_breaker(kind).record_failure()
+            close = getattr(stream, "close", None)
+            if close is not None:
+                await close()
+            raise
+        yield chunk
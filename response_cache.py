@@ -0,0 +1,172 @@
+import os
+import json
+import time
+import asyncio
+import copy
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Cache settings; RESPONSE_CACHE_URL=redis://host:6379/0 shares the cache between bot processes
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", 6 * 3600))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 10000))
+RESPONSE_CACHE_MAX_CHARS = int(os.getenv("RESPONSE_CACHE_MAX_CHARS", 200))  # longer messages are personal, not cached
+RESPONSE_CACHE_URL = os.getenv("RESPONSE_CACHE_URL")
+RESPONSE_CACHE_TIMEOUT = float(os.getenv("RESPONSE_CACHE_TIMEOUT", 0.5))  # seconds per Redis command
+CACHED_ANSWER_TYPES = ("chit-chat",)
+KEY_PREFIX = "response:v1:"
+
+CACHE_REQUESTS = metrics.counter(
+    "response_cache_requests_total", "Response cache lookups by result (hit, miss, skip).", labels=("result",)
+)
+
+_ZERO_WIDTH = dict.fromkeys(map(ord, "\u200b\u200c\u200d\u2060\ufeff"))
+_EDGE_PUNCTUATION = " \t\n.,!?;:~'\"()[]{}…。！？"
+
+
+def normalize_text(text: str) -> str:
+    """
+    Folds the differences that do not change a message's meaning: Unicode
+    form, case, zero-width characters, runs of whitespace and punctuation at
+    either end. "สวัสดี ครับ!!" and "สวัสดี  ครับ" give the same key.
+    """
+    text = unicodedata.normalize("NFKC", text).translate(_ZERO_WIDTH).casefold()
+    return " ".join(text.split()).strip(_EDGE_PUNCTUATION)
+
+
+class MemoryBackend:
+    """In-process LRU store with a per-entry expiry time."""
+
+    blocking = False
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value, ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisBackend:
+    """
+    Store shared between processes, in Redis (needs the optional `redis` package).
+
+    The client is synchronous; `ResponseCache.aget`/`aput` call it from a worker
+    thread so a slow Redis does not stall the event loop.
+    """
+
+    blocking = True
+
+    def __init__(self, url: str, timeout: float = RESPONSE_CACHE_TIMEOUT):
+        import redis
+
+        self._redis = redis.Redis.from_url(url, socket_timeout=timeout, socket_connect_timeout=timeout)
+
+    def get(self, key: str):
+        value = self._redis.get(key)
+        return None if value is None else json.loads(value)
+
+    def set(self, key: str, value, ttl: float) -> None:
+        self._redis.set(key, json.dumps(value, ensure_ascii=False), ex=max(int(ttl), 1))
+
+
+class ResponseCache:
+    """
+    Exact-match cache of LLM answers, keyed by normalized message text.
+
+    Only answers of `answer_types` are stored (card readings should stay fresh),
+    and entries expire after `ttl` seconds. `backend` is anything with
+    `get(key)` and `set(key, value, ttl)`; one whose `blocking` attribute is
+    true does network I/O, so code on the event loop uses `aget` and `aput`.
+    """
+
+    def __init__(self, backend=None, ttl: float = RESPONSE_CACHE_TTL, answer_types=CACHED_ANSWER_TYPES,
+                 max_chars: int = RESPONSE_CACHE_MAX_CHARS):
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.ttl = ttl
+        self.answer_types = tuple(answer_types)
+        self.max_chars = max_chars
+
+    @staticmethod
+    def make_key(text: str) -> str:
+        return KEY_PREFIX + hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+    def cacheable(self, text: str) -> bool:
+        return 0 < len(normalize_text(text)) <= self.max_chars
+
+    def get(self, text: str):
+        """Returns a copy of the cached answer for this message, or None."""
+        if not self.cacheable(text):
+            CACHE_REQUESTS.inc(result="skip")
+            return None
+        try:
+            value = self.backend.get(self.make_key(text))
+        except Exception as e:
+            logger.warning(f"Response cache lookup failed: {e}")
+            value = None
+        CACHE_REQUESTS.inc(result="miss" if value is None else "hit")
+        return None if value is None else copy.deepcopy(value)
+
+    def put(self, text: str, result: dict) -> bool:
+        """Stores an answer if its type is cached; returns whether it was stored."""
+        if "error" in result or result.get("answer_type") not in self.answer_types or not self.cacheable(text):
+            return False
+        try:
+            self.backend.set(self.make_key(text), copy.deepcopy(result), self.ttl)
+        except Exception as e:
+            logger.warning(f"Response cache store failed: {e}")
+            return False
+        return True
+
+    async def aget(self, text: str):
+        """`get` for the event loop."""
+        if not getattr(self.backend, "blocking", False):
+            return self.get(text)
+        return await asyncio.to_thread(self.get, text)
+
+    async def aput(self, text: str, result: dict) -> bool:
+        """`put` for the event loop."""
+        if not getattr(self.backend, "blocking", False):
+            return self.put(text, result)
+        return await asyncio.to_thread(self.put, text, result)
+
+    @staticmethod
+    def hit_rate() -> float:
+        """Hits over cacheable lookups since the process started."""
+        hits, misses = CACHE_REQUESTS.value(result="hit"), CACHE_REQUESTS.value(result="miss")
+        return hits / (hits + misses) if hits + misses else 0.0
+
+
+_cache = None
+
+
+def get_response_cache() -> ResponseCache:
+    """Returns the process-wide response cache, in Redis when RESPONSE_CACHE_URL is set."""
+    global _cache
+    if _cache is None:
+        _cache = ResponseCache(RedisBackend(RESPONSE_CACHE_URL) if RESPONSE_CACHE_URL else MemoryBackend())
+    return _cache
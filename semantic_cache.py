@@ -0,0 +1,248 @@
+"""
+Near-duplicate cache for `prompt.analyze_user_input`.
+
+Messages are compared as sets of character n-grams, which works for Thai
+without a word tokenizer and needs no embedding calls. MinHash signatures
+split into LSH bands find candidate messages in constant time, and the exact
+n-gram Jaccard similarity of a candidate decides the hit against the
+threshold of its answer type.
+
+Near-identical spelling is not near-identical meaning ("I want to dine" and
+"I want to die"), so a hit is refused when the two messages differ by a
+negation, and messages with crisis vocabulary always go to the model.
+
+A sample of hits is also sent to the model in the background (the user still
+gets the cached answer); when the fresh answer type differs from the cached
+one, that hit is counted as a false hit.
+"""
+import os
+import time
+import copy
+import random
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+import metrics
+from collections import Counter
+from response_cache import normalize_text, _EDGE_PUNCTUATION
+
+logger = logging.getLogger(__name__)
+
+NGRAM = 3
+NUM_PERM = 64
+BANDS = 16  # 16 bands of 4 rows: pairs above ~0.5 Jaccard are usually candidates
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", 6 * 3600))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", 5000))
+SEMANTIC_CACHE_MAX_CHARS = int(os.getenv("SEMANTIC_CACHE_MAX_CHARS", 200))
+SEMANTIC_CACHE_AUDIT_RATE = float(os.getenv("SEMANTIC_CACHE_AUDIT_RATE", 0.05))
+
+
+def parse_thresholds(spec: str) -> dict:
+    """Parses "chit-chat=0.7,meme=0.85" into {answer type: minimum similarity}."""
+    thresholds = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        answer_type, value = item.split("=")
+        thresholds[answer_type.strip()] = float(value)
+    return thresholds
+
+
+# Minimum n-gram Jaccard similarity to reuse an answer, per answer type (types not listed are never reused).
+# Below ~0.9, trigram overlap already pairs "i feel happy today" with "i feel unhappy today".
+SEMANTIC_CACHE_THRESHOLDS = parse_thresholds(os.getenv("SEMANTIC_CACHE_THRESHOLDS", "chit-chat=0.9,meme=0.9"))
+
+# A hit is refused when one message has a negation the other lacks
+NEGATIONS = frozenset({
+    "not", "no", "never", "nothing", "nobody", "none", "neither", "nor", "cannot",
+    "dont", "doesnt", "didnt", "isnt", "arent", "wasnt", "werent", "cant", "wont", "couldnt", "shouldnt",
+})
+THAI_NEGATIONS = ("ไม่", "อย่า")  # Thai is written without spaces, so these are matched inside words
+
+# Messages mentioning self-harm or despair are never answered from the cache
+CRISIS_WORDS = frozenset({
+    "die", "dying", "dead", "death", "suicide", "suicidal", "kill", "killing", "overdose",
+    "hopeless", "worthless", "self-harm", "selfharm",
+})
+CRISIS_PHRASES = (
+    "hurt myself", "harm myself", "cut myself", "end my life", "end it all", "want to disappear",
+    "ตาย", "ทำร้ายตัวเอง", "ไม่อยากอยู่", "จบชีวิต", "สิ้นหวัง", "กรีดข้อมือ", "อยากหายไป",
+)
+
+CACHE_REQUESTS = metrics.counter(
+    "semantic_cache_requests_total", "Near-duplicate cache lookups by result (hit, miss, skip), and candidates refused for a negation.",
+    labels=("result",)
+)
+CACHE_HITS = metrics.counter("semantic_cache_hits_total", "Near-duplicate hits by answer type.", labels=("answer_type",))
+HIT_SIMILARITY = metrics.histogram(
+    "semantic_cache_hit_similarity", "Jaccard similarity of near-duplicate hits.",
+    buckets=(0.5, 0.6, 0.7, 0.75, 0.8, 0.85, 0.9, 0.95, 1.0),
+)
+CACHE_AUDITS = metrics.counter(
+    "semantic_cache_audits_total", "Audited hits: agree, or false_hit when the model picks another answer type.",
+    labels=("outcome",),
+)
+
+_MERSENNE = (1 << 61) - 1
+_rng = random.Random(20240101)  # Fixed, so signatures are comparable between runs
+_PERMUTATIONS = [(_rng.randrange(1, _MERSENNE), _rng.randrange(0, _MERSENNE)) for _ in range(NUM_PERM)]
+
+
+def ngrams(text: str, n: int = NGRAM) -> frozenset:
+    """Character n-grams of the normalized text; a text shorter than `n` is its own single gram."""
+    text = normalize_text(text)
+    if len(text) <= n:
+        return frozenset([text]) if text else frozenset()
+    return frozenset(text[i:i + n] for i in range(len(text) - n + 1))
+
+
+def minhash(grams) -> tuple:
+    """MinHash signature of a set of n-grams under NUM_PERM universal hash permutations."""
+    hashes = [int.from_bytes(hashlib.blake2b(g.encode("utf-8"), digest_size=8).digest(), "little") for g in grams]
+    return tuple(min((a * h + b) % _MERSENNE for h in hashes) for a, b in _PERMUTATIONS)
+
+
+def jaccard(a: frozenset, b: frozenset) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def words(text: str) -> list:
+    """Whitespace-separated words of the normalized text, without edge punctuation or apostrophes."""
+    return [w.strip(_EDGE_PUNCTUATION).replace("'", "").replace("\u2019", "") for w in normalize_text(text).split()]
+
+
+def mentions_crisis(text: str) -> bool:
+    normalized = normalize_text(text)
+    return not CRISIS_WORDS.isdisjoint(words(text)) or any(phrase in normalized for phrase in CRISIS_PHRASES)
+
+
+def negation_differs(a: str, b: str) -> bool:
+    """Whether the words only one of the messages has include a negation ("not", "ไม่", "un-happy")."""
+    words_a, words_b = Counter(words(a)), Counter(words(b))
+    for word in (words_a - words_b) + (words_b - words_a):
+        if word in NEGATIONS:
+            return True
+        if word.startswith("un") and word[2:] in words_a.keys() | words_b.keys():
+            return True
+    a, b = normalize_text(a), normalize_text(b)
+    return any(a.count(negation) != b.count(negation) for negation in THAI_NEGATIONS)
+
+
+class SemanticCache:
+    """In-process MinHash/LSH near-duplicate cache with LRU eviction and a TTL."""
+
+    def __init__(self, thresholds=None, ttl: float = SEMANTIC_CACHE_TTL, max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES,
+                 max_chars: int = SEMANTIC_CACHE_MAX_CHARS, audit_rate: float = SEMANTIC_CACHE_AUDIT_RATE):
+        self.thresholds = dict(SEMANTIC_CACHE_THRESHOLDS if thresholds is None else thresholds)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_chars = max_chars
+        self.audit_rate = audit_rate
+        self._entries = OrderedDict()  # id -> (expires_at, text, grams, signature, result)
+        self._buckets = [{} for _ in range(BANDS)]  # band -> {band hash: set of ids}
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def cacheable(self, text: str) -> bool:
+        return 0 < len(normalize_text(text)) <= self.max_chars and not mentions_crisis(text)
+
+    @staticmethod
+    def _bands(signature):
+        rows = NUM_PERM // BANDS
+        return [hash(signature[band * rows:(band + 1) * rows]) for band in range(BANDS)]
+
+    def get(self, text: str):
+        """Returns a copy of the answer to the most similar earlier message above its type's threshold, or None."""
+        if not self.thresholds or not self.cacheable(text):
+            CACHE_REQUESTS.inc(result="skip")
+            return None
+
+        grams = ngrams(text)
+        signature = minhash(grams)
+        best, best_similarity = None, 0.0
+        now = time.monotonic()
+        with self._lock:
+            candidates = set()
+            for band, key in enumerate(self._bands(signature)):
+                candidates |= self._buckets[band].get(key, set())
+            for entry_id in candidates:
+                expires_at, entry_text, entry_grams, _, result = self._entries[entry_id]
+                if expires_at < now:
+                    self._remove(entry_id)
+                    continue
+                similarity = jaccard(grams, entry_grams)
+                threshold = self.thresholds.get(result.get("answer_type"))
+                if threshold is None or similarity < threshold or similarity <= best_similarity:
+                    continue
+                if negation_differs(text, entry_text):
+                    CACHE_REQUESTS.inc(result="negation")
+                    continue
+                best, best_similarity = entry_id, similarity
+            if best is not None:
+                self._entries.move_to_end(best)
+                result = copy.deepcopy(self._entries[best][4])
+
+        if best is None:
+            CACHE_REQUESTS.inc(result="miss")
+            return None
+        CACHE_REQUESTS.inc(result="hit")
+        CACHE_HITS.inc(answer_type=result.get("answer_type"))
+        HIT_SIMILARITY.observe(best_similarity)
+        return result
+
+    def put(self, text: str, result: dict) -> bool:
+        """Stores an answer whose type has a threshold; returns whether it was stored."""
+        if "error" in result or result.get("answer_type") not in self.thresholds or not self.cacheable(text):
+            return False
+
+        grams = ngrams(text)
+        signature = minhash(grams)
+        with self._lock:
+            entry_id, self._next_id = self._next_id, self._next_id + 1
+            self._entries[entry_id] = (time.monotonic() + self.ttl, text, grams, signature, copy.deepcopy(result))
+            for band, key in enumerate(self._bands(signature)):
+                self._buckets[band].setdefault(key, set()).add(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+        return True
+
+    def _remove(self, entry_id) -> None:
+        _, _, _, signature, _ = self._entries.pop(entry_id)
+        for band, key in enumerate(self._bands(signature)):
+            ids = self._buckets[band].get(key)
+            if ids is not None:
+                ids.discard(entry_id)
+                if not ids:
+                    del self._buckets[band][key]
+
+    def should_audit(self) -> bool:
+        """Whether this hit should also be checked against a fresh model answer."""
+        return random.random() < self.audit_rate
+
+    @staticmethod
+    def record_audit(cached: dict, fresh: dict) -> bool:
+        """Counts an audited hit; returns True if it was a false hit."""
+        if "error" in fresh:
+            return False
+        false_hit = cached.get("answer_type") != fresh.get("answer_type")
+        CACHE_AUDITS.inc(outcome="false_hit" if false_hit else "agree")
+        return false_hit
+
+    @staticmethod
+    def false_hit_rate() -> float:
+        """False hits over audited hits since the process started."""
+        false_hits, agreed = CACHE_AUDITS.value(outcome="false_hit"), CACHE_AUDITS.value(outcome="agree")
+        return false_hits / (false_hits + agreed) if false_hits + agreed else 0.0
+
+
+_cache = None
+
+
+def get_semantic_cache() -> SemanticCache:
+    """Returns the process-wide near-duplicate cache."""
+    global _cache
+    if _cache is None:
+        _cache = SemanticCache()
+    return _cache
@@ -0,0 +1,323 @@
+"""
+Local fast path in front of `prompt.analyze_user_input`.
+
+Obvious small talk ("hi", "สวัสดีค่ะ", "ขอบคุณนะ") and laughter ("55555",
+"haha", 😂) are answered locally from a Thai/English lexicon. Short messages
+that a naive Bayes model over character n-grams puts in chit-chat or meme with
+at least ROUTER_THRESHOLD confidence are answered locally too. Anything
+ambiguous or card-worthy still goes to the LLM.
+
+The model is trained from the answers the LLM gave to earlier messages. That
+log holds raw user messages, so it is only written when ROUTER_LOG_PATH is set
+(e.g. ROUTER_LOG_PATH=.cache/llm_inputs.jsonl); it is rotated at
+ROUTER_LOG_MAX_BYTES and written from a background thread.
+
+    python sentiment_router.py train            # .cache/llm_inputs.jsonl -> .cache/router_model.json
+    python sentiment_router.py route "555555"
+"""
+import os
+import re
+import json
+import math
+import time
+import random
+import queue
+import atexit
+import logging
+import argparse
+import threading
+import unicodedata
+from collections import Counter, namedtuple
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+import metrics
+from response_cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOG_PATH = os.path.join(".cache", "llm_inputs.jsonl")
+ROUTER_LOG_PATH = os.getenv("ROUTER_LOG_PATH", "")  # off unless set: the log keeps users' raw messages
+ROUTER_LOG_MAX_BYTES = int(os.getenv("ROUTER_LOG_MAX_BYTES", 5 * 1024 * 1024))
+ROUTER_LOG_BACKUPS = int(os.getenv("ROUTER_LOG_BACKUPS", 2))  # rotated files kept (.1, .2, ...)
+ROUTER_MODEL_PATH = os.getenv("ROUTER_MODEL_PATH", os.path.join(".cache", "router_model.json"))
+ROUTER_THRESHOLD = float(os.getenv("ROUTER_THRESHOLD", 0.9))
+ROUTER_MAX_CHARS = int(os.getenv("ROUTER_MAX_CHARS", 40))  # the model only settles short messages
+LOCAL_ANSWER_TYPES = ("chit-chat", "meme")
+NGRAM_SIZES = (1, 2, 3)
+
+ROUTER_DECISIONS = metrics.counter(
+    "router_decisions_total", "Text messages by route (lexicon, model, llm) and answer type.", labels=("route", "answer_type")
+)
+ROUTER_SECONDS = metrics.histogram(
+    "router_seconds", "Time to route one message.", buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.01)
+)
+ROUTER_CONFIDENCE = metrics.histogram(
+    "router_model_confidence", "Confidence of the n-gram model's top class.", buckets=(0.5, 0.6, 0.7, 0.8, 0.9, 0.95, 0.99, 1.0)
+)
+
+Route = namedtuple("Route", ["route", "answer_type", "confidence", "intent"])
+
+# Lexicon: whole messages (after normalization and dropping polite particles) that need no LLM
+GREETINGS = {"สวัสดี", "หวัดดี", "ดี", "ดีจ้า", "hi", "hello", "hey", "hiya", "yo", "good morning", "good night", "gm", "gn",
+             "อรุณสวัสดิ์", "ฝันดี", "ราตรีสวัสดิ์", "ทำอะไรอยู่", "เป็นไงบ้าง", "สบายดีไหม", "how are you"}
+THANKS = {"ขอบคุณ", "ขอบคุณมาก", "ขอบใจ", "ขอบคุณมากๆ", "thanks", "thank you", "thx", "ty", "tysm"}
+ACKS = {"ok", "okay", "k", "โอเค", "ได้", "อืม", "อ๋อ", "จ้า", "ค่ะ", "ครับ", "yes", "ใช่", "bye", "บาย"}
+#   A bare "no" usually answers the bot's last question, so it always gets a real reply
+REFUSALS = {"no", "nope", "nah", "not really", "ไม่", "ไม่ใช่", "ไม่เอา", "ไม่ได้", "ไม่อะ"}
+LAUGHTER = re.compile(r"^(?:5{3,}|(?:ฮ่า|ฮา)+ๆ*|ถ{3,}|(?:ha|he|hah|heh)+h?|lo+l|lmao|rofl|xd+)$")
+POLITE_PARTICLES = re.compile(r"(?:\s*(?:ครับ|คับ|ค่ะ|คะ|ค่า|จ้า|จ้ะ|นะ|น้า|ฮะ))+$")
+LAUGH_EMOJI = set("😂🤣😆😹😝😜😛😄😁")
+#   Emoji-only messages are settled locally only when every emoji is clearly neutral or positive;
+#   😢, 💔, 🔪 and anything unlisted go to the LLM
+FRIENDLY_EMOJI = set("👍👌🙏👋✌🤗😊🙂😀😃☺😉😇🥰😍😘❤💜💕💖💗🧡💛💚💙✨🌟⭐🎉🥳🌸🌼")
+EMOJI_MODIFIERS = set("\u200d\ufe0f\U0001f3fb\U0001f3fc\U0001f3fd\U0001f3fe\U0001f3ff")  # joiners, skin tones
+THAI = re.compile(r"[\u0e00-\u0e7f]")
+
+LOCAL_REPLIES = {
+    ("greeting", "th"): ["สวัสดีค่ะ 🧞‍♀️ วันนี้เป็นยังไงบ้าง เล่าให้ฟังหน่อยได้ไหม?", "หวัดดีค่ะ 😊 มีอะไรอยากคุยกันไหมวันนี้?"],
+    ("greeting", "en"): ["Hi there 🧞‍♀️ How is your day going?", "Hello! 😊 What's on your mind today?"],
+    ("thanks", "th"): ["ยินดีเสมอค่ะ 💜 มีอะไรอยากเล่าอีกบอกได้เลยนะ"],
+    ("thanks", "en"): ["Anytime 💜 I'm here whenever you want to talk."],
+    ("ack", "th"): ["รับทราบค่ะ 😊 อยากคุยเรื่องอะไรต่อดี?"],
+    ("ack", "en"): ["Got it 😊 What would you like to talk about next?"],
+    ("chat", "th"): ["เล่าให้ฟังเพิ่มอีกหน่อยได้ไหมคะ? 😊"],
+    ("chat", "en"): ["Tell me a bit more? 😊"],
+}
+
+
+def _strip_emoji(text: str):
+    """Splits a message into its text and the emoji/symbols in it."""
+    emoji = [ch for ch in text if unicodedata.category(ch) in ("So", "Sk") or ch in EMOJI_MODIFIERS]
+    rest = "".join(ch for ch in text if ch not in emoji)
+    return rest, emoji
+
+
+def lexicon_route(text: str):
+    """Returns (answer_type, intent) for a message the lexicon settles on its own, or None."""
+    rest, emoji = _strip_emoji(normalize_text(text))
+    if not rest:
+        emoji = set(emoji) - EMOJI_MODIFIERS
+        if not emoji or not emoji <= LAUGH_EMOJI | FRIENDLY_EMOJI:
+            return None
+        return ("meme", "laugh") if emoji & LAUGH_EMOJI else ("chit-chat", "ack")
+    if LAUGHTER.match(rest.replace(" ", "")):
+        return "meme", "laugh"
+
+    #   "hiii" -> "hi", "ดีจ้าาา" -> "ดีจ้า", then also try without polite particles
+    rest = re.sub(r"(\D)\1{2,}", r"\1", rest)
+    for candidate in (rest, POLITE_PARTICLES.sub("", rest).strip()):
+        if candidate in GREETINGS:
+            return "chit-chat", "greeting"
+        if candidate in THANKS:
+            return "chit-chat", "thanks"
+        if candidate in ACKS:
+            return "chit-chat", "ack"
+    return None
+
+
+def _needs_llm(text: str) -> bool:
+    """Messages the n-gram model must not settle either: refusals, and emoji the lexicon left alone."""
+    rest, _ = _strip_emoji(normalize_text(text))
+    rest = POLITE_PARTICLES.sub("", rest).strip()
+    return not rest or rest in REFUSALS
+
+
+def features(text: str):
+    """Character 1-3 grams of the normalized text (no word tokenizer, so Thai works as is)."""
+    text = normalize_text(text)
+    return [text[i:i + n] for n in NGRAM_SIZES for i in range(len(text) - n + 1)]
+
+
+class NaiveBayesRouter:
+    """Multinomial naive Bayes over character n-grams, stored as plain JSON."""
+
+    def __init__(self, log_prior: dict, log_likelihood: dict, log_unknown: dict):
+        self.log_prior = log_prior
+        self.log_likelihood = log_likelihood
+        self.log_unknown = log_unknown
+
+    @classmethod
+    def train(cls, examples, alpha: float = 1.0) -> "NaiveBayesRouter":
+        """Fits the model on (text, answer_type) pairs with Laplace smoothing."""
+        class_counts = Counter()
+        gram_counts = {}
+        for text, answer_type in examples:
+            class_counts[answer_type] += 1
+            gram_counts.setdefault(answer_type, Counter()).update(features(text))
+
+        vocabulary = set().union(*gram_counts.values()) if gram_counts else set()
+        total = sum(class_counts.values())
+        log_prior, log_likelihood, log_unknown = {}, {}, {}
+        for answer_type, grams in gram_counts.items():
+            denominator = sum(grams.values()) + alpha * (len(vocabulary) + 1)
+            log_prior[answer_type] = math.log(class_counts[answer_type] / total)
+            log_likelihood[answer_type] = {gram: math.log((count + alpha) / denominator) for gram, count in grams.items()}
+            log_unknown[answer_type] = math.log(alpha / denominator)
+        return cls(log_prior, log_likelihood, log_unknown)
+
+    def predict(self, text: str):
+        """Returns (answer_type, probability) of the most likely class."""
+        grams = features(text)
+        scores = {
+            answer_type: prior + sum(self.log_likelihood[answer_type].get(g, self.log_unknown[answer_type]) for g in grams)
+            for answer_type, prior in self.log_prior.items()
+        }
+        best = max(scores, key=scores.get)
+        total = sum(math.exp(score - scores[best]) for score in scores.values())
+        return best, 1.0 / total
+
+    def save(self, path: str) -> None:
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"log_prior": self.log_prior, "log_likelihood": self.log_likelihood, "log_unknown": self.log_unknown},
+                      f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str) -> "NaiveBayesRouter":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["log_prior"], data["log_likelihood"], data["log_unknown"])
+
+
+class SentimentRouter:
+    """Decides whether a message is answered locally or sent to the LLM."""
+
+    def __init__(self, model: NaiveBayesRouter = None, threshold: float = ROUTER_THRESHOLD,
+                 max_chars: int = ROUTER_MAX_CHARS):
+        self.model = model
+        self.threshold = threshold
+        self.max_chars = max_chars
+
+    def route(self, text: str) -> Route:
+        start = time.perf_counter()
+        decision = self._route(text)
+        ROUTER_SECONDS.observe(time.perf_counter() - start)
+        ROUTER_DECISIONS.inc(route=decision.route, answer_type=decision.answer_type or "")
+        return decision
+
+    def _route(self, text: str) -> Route:
+        lexicon = lexicon_route(text)
+        if lexicon is not None:
+            return Route("lexicon", lexicon[0], 1.0, lexicon[1])
+
+        if self.model is not None and len(normalize_text(text)) <= self.max_chars and not _needs_llm(text):
+            answer_type, confidence = self.model.predict(text)
+            ROUTER_CONFIDENCE.observe(confidence)
+            if answer_type in LOCAL_ANSWER_TYPES and confidence >= self.threshold:
+                return Route("model", answer_type, confidence, "laugh" if answer_type == "meme" else "chat")
+        return Route("llm", None, 0.0, None)
+
+
+def local_answer(text: str, decision: Route, meme_image: str) -> dict:
+    """The reply for a message the router settled, in the same shape the LLM returns."""
+    if decision.answer_type == "meme":
+        return {"answer_type": "meme", "response": {"image_link": meme_image}}
+    language = "th" if THAI.search(text) else "en"
+    replies = LOCAL_REPLIES.get((decision.intent, language), LOCAL_REPLIES[("chat", language)])
+    return {"answer_type": "chit-chat", "response": {"text": random.choice(replies)}}
+
+
+_log_handlers = {}
+_log_lock = threading.Lock()
+
+
+def _log_handler(path: str) -> QueueHandler:
+    """Queue in front of a rotating file, so logging a message never waits on disk."""
+    with _log_lock:
+        handler = _log_handlers.get(path)
+        if handler is None:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            file_handler = RotatingFileHandler(
+                path, maxBytes=ROUTER_LOG_MAX_BYTES, backupCount=ROUTER_LOG_BACKUPS, encoding="utf-8"
+            )
+            records = queue.SimpleQueue()
+            listener = QueueListener(records, file_handler)
+            listener.start()
+            atexit.register(listener.stop)
+            handler = _log_handlers[path] = QueueHandler(records)
+    return handler
+
+
+def log_llm_answer(text: str, result: dict, path: str = None) -> None:
+    """Queues the LLM's answer type for a message for the training log (ROUTER_LOG_PATH by default)."""
+    path = ROUTER_LOG_PATH if path is None else path
+    if not path or "error" in result or not result.get("answer_type"):
+        return
+    try:
+        line = json.dumps({"text": text, "answer_type": result["answer_type"]}, ensure_ascii=False)
+        _log_handler(path).handle(logging.makeLogRecord({"msg": line, "levelno": logging.INFO}))
+    except OSError as e:
+        logger.warning(f"Could not log routed input: {e}")
+
+
+def read_log(path: str = DEFAULT_LOG_PATH):
+    """Yields (text, answer_type) pairs from a log written by `log_llm_answer`, oldest rotated file first."""
+    rotated = [f"{path}.{i}" for i in range(ROUTER_LOG_BACKUPS, 0, -1)]
+    for log_path in [p for p in rotated if os.path.exists(p)] + [path]:
+        with open(log_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # A line cut off by a crash
+                yield entry["text"], entry["answer_type"]
+
+
+_router = None
+
+
+def get_router() -> SentimentRouter:
+    """Returns the process-wide router, with the trained model if one is at ROUTER_MODEL_PATH."""
+    global _router
+    if _router is None:
+        model = None
+        if os.path.exists(ROUTER_MODEL_PATH):
+            model = NaiveBayesRouter.load(ROUTER_MODEL_PATH)
+            logger.info(f"Loaded router model from {ROUTER_MODEL_PATH}")
+        _router = SentimentRouter(model)
+    return _router
+
+
+def train_command(args) -> None:
+    examples = list(read_log(args.log))
+    if not examples:
+        raise SystemExit(f"No logged inputs in {args.log}")
+    random.Random(0).shuffle(examples)
+
+    #   Hold out a fifth to report how often the model would settle a message locally, and how often correctly
+    split = len(examples) * 4 // 5 if len(examples) >= 10 else len(examples)
+    model = NaiveBayesRouter.train(examples[:split])
+    router = SentimentRouter(model, threshold=args.threshold)
+    held_out = examples[split:]
+    if held_out:
+        decisions = [(router._route(text), answer_type) for text, answer_type in held_out]
+        local = [(decision, answer_type) for decision, answer_type in decisions if decision.route != "llm"]
+        correct = sum(decision.answer_type == answer_type for decision, answer_type in local)
+        print(f"  Held out {len(held_out)}: {len(local)} answered locally, {correct} of them with the LLM's answer type.")
+
+    NaiveBayesRouter.train(examples).save(args.output)
+    print(f"  Trained on {len(examples)} logged inputs {dict(Counter(t for _, t in examples))}, saved to {args.output}.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train or try the local sentiment router.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    train = commands.add_parser("train", help="Train the n-gram model on logged LLM answers.")
+    train.add_argument("--log", default=ROUTER_LOG_PATH or DEFAULT_LOG_PATH)
+    train.add_argument("-o", "--output", default=ROUTER_MODEL_PATH)
+    train.add_argument("--threshold", type=float, default=ROUTER_THRESHOLD)
+    route = commands.add_parser("route", help="Show how messages would be routed.")
+    route.add_argument("messages", nargs="+")
+    args = parser.parse_args()
+
+    if args.command == "train":
+        train_command(args)
+    else:
+        router = get_router()
+        for message in args.messages:
+            print(f"  {message!r}: {router.route(message)}")
+
+
+if __name__ == "__main__":
+    main()
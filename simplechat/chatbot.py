@@ -1,19 +1,20 @@
 import streamlit as st
 import time
-from openai import OpenAI
 import os
+import sys
 import logging
 
+# The shared client factory lives in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import llm_accounting
+from llm_client import get_client, timeout_for
+
 # Logging configuration
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    logger.error("OPENAI_API_KEY is not set in environment variables.")
-    raise EnvironmentError("Missing OPENAI_API_KEY.")
-
-client = OpenAI(api_key=OPENAI_API_KEY)
+# Streamlit reruns this script on every interaction; the client and its connections are reused
+client = get_client()
 
 doc_dir = "docs"
 
@@ -36,19 +37,30 @@ for message in st.session_state.messages:
 
 # Function to get chatbot response
 def chatbot_response(user_message):
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[
-            {"role": "system", "content": "You are an AI assistant."},
-            {"role": "user", "content": user_message},
-        ],
-        stream=True,
-    )
-
-    for chunk in response:
-        if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content:
-            yield chunk.choices[0].delta.content
-            time.sleep(0.05)  # Smooth streaming effect
+    call = llm_accounting.CallRecord("simplechat", "gpt-4o", answer_type="chat")
+    try:
+        response = client.chat.completions.create(
+            model="gpt-4o",
+            messages=[
+                {"role": "system", "content": "You are an AI assistant."},
+                {"role": "user", "content": user_message},
+            ],
+            stream=True,
+            stream_options={"include_usage": True},
+            timeout=timeout_for("stream"),
+        )
+        call.first_byte()
+
+        for chunk in response:
+            call.set_usage(chunk.usage)  # Sent with the last chunk
+            if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+                time.sleep(0.05)  # Smooth streaming effect
+    except Exception:
+        call.ok = False
+        raise
+    finally:
+        llm_accounting.record(call)
 
 #Function document process
 def load_and_index_documents(documents):
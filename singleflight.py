@@ -0,0 +1,96 @@
+"""
+Coalescing of identical concurrent calls ("singleflight").
+
+When a broadcast or a group chat makes many users send the same text at once,
+the first caller for a key makes the upstream call and everyone who asks for
+the same key while it is in flight waits for that call and gets a copy of its
+result. Nothing is kept once the call finishes; that is the caches' job.
+
+    flight = SingleFlight("chat")
+    result = await flight.do(key, lambda: ask_model(text))
+"""
+import copy
+import asyncio
+import logging
+import metrics
+
+logger = logging.getLogger(__name__)
+
+FLIGHT_CALLS = metrics.counter(
+    "singleflight_calls_total",
+    "Calls by role: leader made the upstream call, coalesced shared a call already in flight.",
+    labels=("flight", "role"),
+)
+
+
+class SingleFlight:
+    """
+    Per-key deduplication of in-flight async calls within one event loop.
+
+    `do(key, fn)` covers most uses. A caller that cannot hand its work over as
+    a coroutine function (a streamed reply, say) can `claim` the key itself and
+    must then `release` it with the result, or with None if it gave up.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls = {}  # key -> future of the leader's result
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def claim(self, key):
+        """Returns (future, leader): leader is True if the caller now owns the call for `key`."""
+        future = self._calls.get(key)
+        if future is not None:
+            return future, False
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        FLIGHT_CALLS.inc(flight=self.name, role="leader")
+        return future, True
+
+    def release(self, key, future, result=None, error: BaseException = None) -> None:
+        """Hands the leader's result (or error) to the waiting callers; None means the call was abandoned."""
+        if self._calls.get(key) is future:
+            del self._calls[key]
+        if future.done():
+            return
+        if error is not None and not isinstance(error, asyncio.CancelledError):
+            future.set_exception(error)
+            future.exception()  # Retrieved here, so asyncio does not warn when nobody was waiting
+        elif error is None and result is not None:
+            #   A copy, so the leader's caller can change its result without touching the others'
+            future.set_result(copy.deepcopy(result))
+        else:
+            future.cancel()
+
+    async def wait(self, future):
+        """Waits for another caller's call; returns a copy of its result, or raises CancelledError if it was abandoned."""
+        result = await asyncio.shield(future)
+        FLIGHT_CALLS.inc(flight=self.name, role="coalesced")
+        return copy.deepcopy(result)
+
+    async def do(self, key, fn):
+        """Returns `await fn()`, sharing one call among all callers asking for `key` at the same time."""
+        while True:
+            future, leader = self.claim(key)
+            if leader:
+                try:
+                    result = await fn()
+                except BaseException as e:
+                    self.release(key, future, error=e)
+                    raise
+                self.release(key, future, result)
+                return result
+            try:
+                return await self.wait(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise  # This caller was cancelled, not the leader
+                logger.info(f"Leader of {self.name} call was cancelled; retrying")
+
+    def coalesced_rate(self) -> float:
+        """Coalesced calls over all calls of this flight since the process started."""
+        leaders = FLIGHT_CALLS.value(flight=self.name, role="leader")
+        coalesced = FLIGHT_CALLS.value(flight=self.name, role="coalesced")
+        return coalesced / (leaders + coalesced) if leaders + coalesced else 0.0
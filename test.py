@@ -1,11 +1,7 @@
-from openai import OpenAI
 import json
-import os
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+from llm_client import get_client, timeout_for
 
 
-# Initialize OpenAI client
-
 def mood_to_tarot_mapping(mood):
     # Predefined mood-to-tarot mapping
     tarot_map = {
@@ -73,9 +69,10 @@ def generate_image_prompt(tarot_card):
 
 def generate_tarot_image(prompt):
     # Call DALL·E to create an image
-    response = client.images.generate(prompt=prompt,
+    response = get_client().images.generate(prompt=prompt,
     n=1,
-    size="1024x1024")
+    size="1024x1024",
+    timeout=timeout_for("image"))
     return response.data[0].url
 
 # Main function
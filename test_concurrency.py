@@ -0,0 +1,210 @@
+import time
+import asyncio
+import argparse
+from types import SimpleNamespace
+from contextlib import contextmanager
+import prompt
+import llm_client
+import response_cache
+import semantic_cache
+import sentiment_router
+import singleflight
+import resilience
+import llm_accounting
+
+# Simulated completion latency (seconds); a real gpt-4o reading takes a few seconds
+COMPLETION_SECONDS = 0.5
+
+
+class SlowCompletions:
+    """Stands in for `client.chat.completions`: every call waits like a real round trip."""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        content = '{"answer_type": "chit-chat", "response": {"text": "hi"}}'
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+@contextmanager
+def isolated_bot(completions, cache_backend=None):
+    """
+    Points the bot at a stand-in for `client.chat.completions`, with empty caches
+    and breakers, and puts every module global back afterwards.
+    """
+    saved = (llm_client._clients.get("async"), response_cache._cache, semantic_cache._cache,
+             dict(resilience._breakers), sentiment_router.ROUTER_LOG_PATH, llm_accounting.LLM_ACCOUNTING)
+    llm_client._clients["async"] = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    #   Every user must reach the model
+    response_cache._cache = response_cache.ResponseCache(cache_backend)
+    semantic_cache._cache = semantic_cache.SemanticCache()
+    resilience._breakers.clear()
+    sentiment_router.ROUTER_LOG_PATH = ""  # Keep simulated messages out of the router's training log
+    llm_accounting.LLM_ACCOUNTING = False  # and simulated calls out of the accounting store
+    try:
+        yield
+    finally:
+        client, response_cache._cache, semantic_cache._cache, breakers, \
+            sentiment_router.ROUTER_LOG_PATH, llm_accounting.LLM_ACCOUNTING = saved
+        resilience._breakers.clear()
+        resilience._breakers.update(breakers)
+        if client is None:
+            llm_client._clients.pop("async", None)
+        else:
+            llm_client._clients["async"] = client
+
+
+async def serve_users(n_users, delay=COMPLETION_SECONDS, same_text=False, answer_type="chit-chat"):
+    """Sends one message per simulated user at the same time; returns (seconds, completions stand-in)."""
+    completions = SlowCompletions(delay)
+    with isolated_bot(completions):
+        start = time.perf_counter()
+        responses = await asyncio.gather(*(prompt.analyze_user_input("how will my week go" if same_text else f"user {i}") for i in range(n_users)))
+        elapsed = time.perf_counter() - start
+
+    assert all(response.get("answer_type") == answer_type for response in responses), responses
+    return elapsed, completions
+
+
+def test_concurrent_users_served_in_parallel(n_users=10):
+    elapsed, completions = asyncio.run(serve_users(n_users))
+    #   Served one after another this would take n_users * COMPLETION_SECONDS
+    assert completions.max_in_flight == n_users, \
+        f"only {completions.max_in_flight} of {n_users} requests were in flight together"
+    assert elapsed < 2 * COMPLETION_SECONDS, f"{n_users} users took {elapsed:.2f}s"
+
+
+def test_identical_messages_share_one_call(n_users=10):
+    coalesced = singleflight.FLIGHT_CALLS.value(flight="chat", role="coalesced")
+    elapsed, completions = asyncio.run(serve_users(n_users, same_text=True))
+    assert completions.calls == 1, f"{completions.calls} completions for one message"
+    assert singleflight.FLIGHT_CALLS.value(flight="chat", role="coalesced") - coalesced == n_users - 1
+
+
+
+def test_hung_upstream_bounded_by_deadline(n_users=10, deadline=0.3):
+    """A brownout costs users the call deadline, not the hung request's own timeout."""
+    saved = resilience.DEADLINES["chat"]
+    resilience.DEADLINES["chat"] = deadline
+    try:
+        elapsed, _ = asyncio.run(serve_users(n_users, delay=60, answer_type=None))
+    finally:
+        resilience.DEADLINES["chat"] = saved
+    assert elapsed < 2 * deadline, f"hung upstream kept users waiting {elapsed:.2f}s"
+
+
+class SlowSharedBackend(response_cache.MemoryBackend):
+    """A response cache store with network latency, like Redis, called through a blocking client."""
+
+    blocking = True
+
+    def __init__(self, delay):
+        super().__init__()
+        self.delay = delay
+
+    def get(self, key):
+        time.sleep(self.delay)
+        return super().get(key)
+
+    def set(self, key, value, ttl):
+        time.sleep(self.delay)
+        super().set(key, value, ttl)
+
+
+def test_shared_cache_does_not_block_event_loop(delay=0.3):
+    """Lookups in a slow shared cache leave the event loop free for other chats."""
+
+    async def ticker(stop):
+        worst, last = 0.0, time.perf_counter()
+        while not stop.is_set():
+            await asyncio.sleep(0.01)
+            now = time.perf_counter()
+            worst, last = max(worst, now - last), now
+        return worst
+
+    async def answer_while_ticking():
+        stop = asyncio.Event()
+        ticks = asyncio.create_task(ticker(stop))
+        response = await prompt.analyze_user_input("what does the moon card mean")
+        stop.set()
+        return response, await ticks
+
+    with isolated_bot(SlowCompletions(0), SlowSharedBackend(delay)):
+        response, worst_gap = asyncio.run(answer_while_ticking())
+    assert response.get("answer_type") == "chit-chat", response
+    assert worst_gap < delay / 2, f"event loop stalled for {worst_gap:.2f}s on the shared cache"
+
+
+class TricklingStream:
+    """A streamed reply that opens at once and then sends a chunk every `interval` seconds, forever."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        await asyncio.sleep(self.interval)
+        delta = SimpleNamespace(content=" ")
+        return SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=delta)])
+
+    async def close(self):
+        self.closed = True
+
+
+def test_trickling_stream_bounded_by_reply_deadline(deadline=0.3):
+    """A stream that opens but never finishes is cut off and counted against the breaker."""
+    stream = TricklingStream(0.05)
+
+    async def create(**kwargs):
+        return stream
+
+    async def read_reply():
+        return [event async for event in prompt.stream_user_input("tell me a very long story")]
+
+    saved = resilience.DEADLINES["stream_reply"]
+    resilience.DEADLINES["stream_reply"] = deadline
+    try:
+        with isolated_bot(SimpleNamespace(create=create)):
+            start = time.perf_counter()
+            events = asyncio.run(read_reply())
+            elapsed = time.perf_counter() - start
+            stream_failures = resilience.get_breaker("stream").consecutive_failures
+    finally:
+        resilience.DEADLINES["stream_reply"] = saved
+    assert elapsed < 2 * deadline, f"trickling stream kept the user waiting {elapsed:.2f}s"
+    assert events[-1] == ("done", prompt.model_error(asyncio.TimeoutError()))
+    assert stream.closed
+    assert stream_failures == 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that simultaneous chats do not wait for each other.")
+    parser.add_argument("-n", "--users", type=int, default=10)
+    args = parser.parse_args()
+
+    elapsed, completions = asyncio.run(serve_users(args.users))
+    print(f"{args.users} users served in {elapsed:.2f}s ({completions.max_in_flight} requests in flight at once, "
+          f"{args.users * COMPLETION_SECONDS:.1f}s if served one by one)")
+    test_concurrent_users_served_in_parallel(args.users)
+    test_identical_messages_share_one_call(args.users)
+    print(f"{args.users} identical messages served with one completion")
+    test_hung_upstream_bounded_by_deadline(args.users)
+    print("hung upstream answered within the deadline")
+    test_trickling_stream_bounded_by_reply_deadline()
+    print("trickling stream cut off at the reply deadline")
+    test_shared_cache_does_not_block_event_loop()
+    print("slow shared cache did not stall the event loop")
@@ -0,0 +1,58 @@
+import os
+import glob
+import numpy as np
+import librosa
+import fast_features
+from feature_detection import load_audio, compute_spectrogram
+
+# Same tolerances as bench_fast_features.py
+RTOL = 1e-5
+ATOL = 1e-7
+
+AUDIO_DIR = "short_audio_files"
+N_CLIPS = 5
+SR = 16000
+
+
+def assert_matches_librosa(y, sr, label):
+    y = np.asarray(y, dtype=np.float32)
+    S = compute_spectrogram(y)
+    pairs = {
+        "rms": (librosa.feature.rms(y=y)[0], fast_features.rms(y)),
+        "zero_crossing_rate": (librosa.feature.zero_crossing_rate(y)[0], fast_features.zero_crossing_rate(y)),
+        "spectral_centroid": (librosa.feature.spectral_centroid(S=S, sr=sr)[0], fast_features.spectral_centroid(S, sr)),
+    }
+    for name, (expected, actual) in pairs.items():
+        assert actual.shape == expected.shape, f"{name} on {label}: shape {actual.shape} != {expected.shape}"
+        assert np.allclose(actual, expected, rtol=RTOL, atol=ATOL), \
+            f"{name} on {label}: worst difference {np.max(np.abs(actual - expected)):.2e}"
+
+
+def test_recorded_clips_match_librosa():
+    audio_files = sorted(glob.glob(os.path.join(AUDIO_DIR, "*.wav")))[:N_CLIPS]
+    assert audio_files, f"No .wav files found in {AUDIO_DIR}"
+    for file in audio_files:
+        y, sr = load_audio(file)
+        assert_matches_librosa(y, sr, os.path.basename(file))
+
+
+def test_silent_clip_matches_librosa():
+    assert_matches_librosa(np.zeros(SR), SR, "1 s of silence")
+
+
+def test_clip_shorter_than_a_frame_matches_librosa():
+    t = np.arange(fast_features.FRAME_LENGTH // 2) / SR
+    assert_matches_librosa(0.1 * np.sin(2 * np.pi * 220 * t), SR, "half-frame tone")
+
+
+def test_tiny_values_count_as_zero_crossings_like_librosa():
+    """Samples under librosa's zero threshold do not cross zero."""
+    y = np.tile([1e-12, -1e-12, 0.5, -0.5], SR // 4)
+    assert_matches_librosa(y, SR, "sub-threshold noise")
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"{name} passed")
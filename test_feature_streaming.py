@@ -0,0 +1,64 @@
+import os
+import glob
+import numpy as np
+import feature_detection
+from feature_detection import load_audio, extract_features_from_array, FEATURE_FAILURES, STAGE_SECONDS
+
+AUDIO_DIR = "short_audio_files"
+N_CLIPS = 4
+STREAMED_STAGES = ("load", "stft", "mel_spectrogram", "mfcc", "spectral_centroid", "spectral_contrast",
+                   "rms_energy", "zero_crossing_rate", "pitch")
+
+
+def long_clip():
+    """A few short clips back to back, at the default analysis rate."""
+    clips = [load_audio(file) for file in sorted(glob.glob(os.path.join(AUDIO_DIR, "*.wav")))[:N_CLIPS]]
+    assert clips, f"No .wav files found in {AUDIO_DIR}"
+    return np.concatenate([y for y, _ in clips]), clips[0][1]
+
+
+def test_streaming_matches_in_memory():
+    y, sr = long_clip()
+    for pitch_mode in ("full", "voiced"):
+        in_memory = extract_features_from_array(y, sr, name="clip", pitch_mode=pitch_mode, streaming=False)
+        streamed = extract_features_from_array(y, sr, name="clip", pitch_mode=pitch_mode, streaming=True)
+        for name, value in in_memory.items():
+            if name != "filename":
+                assert np.isclose(streamed[name], value, rtol=1e-3), f"{name} ({pitch_mode}): {streamed[name]} != {value}"
+
+
+def test_failed_stage_falls_back_to_zero_when_streaming():
+    """A stage that fails on a chunk gives 0 for its feature, as in memory, instead of losing the clip."""
+    y, sr = long_clip()
+    saved = feature_detection.frame_zero_crossing_rate
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("boom")
+
+    feature_detection.frame_zero_crossing_rate = broken
+    try:
+        failures = FEATURE_FAILURES.value(stage="zero_crossing_rate", error="RuntimeError")
+        for streaming in (False, True):
+            features = extract_features_from_array(y, sr, name="clip", streaming=streaming)
+            assert features is not None, f"streaming={streaming} lost the clip"
+            assert features["zero_crossing_rate"] == 0
+            assert features["rms_energy"] > 0 and features["pitch_mean"] > 0
+        #   Counted once per clip, not once per chunk
+        assert FEATURE_FAILURES.value(stage="zero_crossing_rate", error="RuntimeError") - failures == 2
+    finally:
+        feature_detection.frame_zero_crossing_rate = saved
+
+
+def test_streaming_times_each_stage_once_per_clip():
+    y, sr = long_clip()
+    before = {stage: STAGE_SECONDS.count(stage=stage) for stage in STREAMED_STAGES}
+    extract_features_from_array(y, sr, name="clip", pitch_mode="full", streaming=True)
+    for stage in STREAMED_STAGES:
+        assert STAGE_SECONDS.count(stage=stage) - before[stage] == 1, f"{stage} not timed once"
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"{name} passed")
@@ -0,0 +1,57 @@
+import os
+import time
+import tempfile
+import llm_accounting
+
+
+class SlowStore(llm_accounting.AccountingStore):
+    """An accounting store whose writes wait like a locked SQLite file shared with another process."""
+
+    def __init__(self, path, delay):
+        super().__init__(path)
+        self.delay = delay
+
+    def record(self, call):
+        time.sleep(self.delay)
+        super().record(call)
+
+
+def test_record_does_not_wait_for_the_store(delay=0.3):
+    saved = llm_accounting._store, llm_accounting.LLM_ACCOUNTING
+    with tempfile.TemporaryDirectory() as tmp:
+        store = llm_accounting._store = SlowStore(os.path.join(tmp, "calls.sqlite"), delay)
+        llm_accounting.LLM_ACCOUNTING = True
+        try:
+            call = llm_accounting.CallRecord("test", "gpt-4o-mini", answer_type="chit-chat")
+            call.set_usage(type("Usage", (), {"prompt_tokens": 100, "completion_tokens": 20})())
+            start = time.perf_counter()
+            llm_accounting.record(call)
+            assert time.perf_counter() - start < delay / 2, "record waited for the SQLite write"
+
+            assert llm_accounting.flush(timeout=5)
+            rows = store.rows()
+            assert len(rows) == 1
+            assert rows[0]["source"] == "test" and rows[0]["prompt_tokens"] == 100
+            assert rows[0]["cost_usd"] > 0
+        finally:
+            llm_accounting._store, llm_accounting.LLM_ACCOUNTING = saved
+
+
+def test_disabled_accounting_stores_nothing():
+    saved = llm_accounting._store, llm_accounting.LLM_ACCOUNTING
+    with tempfile.TemporaryDirectory() as tmp:
+        store = llm_accounting._store = llm_accounting.AccountingStore(os.path.join(tmp, "calls.sqlite"))
+        llm_accounting.LLM_ACCOUNTING = False
+        try:
+            llm_accounting.record(llm_accounting.CallRecord("test", "gpt-4o"))
+            assert llm_accounting.flush(timeout=5)
+            assert store.rows() == []
+        finally:
+            llm_accounting._store, llm_accounting.LLM_ACCOUNTING = saved
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"{name} passed")
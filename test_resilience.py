@@ -0,0 +1,154 @@
+import time
+import asyncio
+from types import SimpleNamespace
+import resilience
+
+
+class UpstreamError(Exception):
+    """Stands in for an OpenAI APIStatusError: a status code and the response headers."""
+
+    def __init__(self, status_code, retry_after=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers={} if retry_after is None else {"retry-after": str(retry_after)})
+
+
+class FakeUpstream:
+    """`fn` for resilience.call: each attempt takes the next (delay, outcome) step; an exception outcome is raised."""
+
+    def __init__(self, *steps):
+        self.steps = list(steps)
+        self.calls = 0
+
+    async def __call__(self):
+        delay, outcome = self.steps[min(self.calls, len(self.steps) - 1)]
+        self.calls += 1
+        await asyncio.sleep(delay)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+
+def fresh_breaker(kind, failures=resilience.LLM_BREAKER_FAILURES, reset=resilience.LLM_BREAKER_RESET):
+    resilience._breakers[kind] = resilience.CircuitBreaker(kind, failures, reset)
+    resilience._latencies.pop(kind, None)
+    return resilience._breakers[kind]
+
+
+def test_retry_after_is_honoured():
+    fresh_breaker("test-retry-after")
+    upstream = FakeUpstream((0, UpstreamError(429, retry_after=0.2)), (0, "ok"))
+    saved = resilience.LLM_BACKOFF_BASE
+    resilience.LLM_BACKOFF_BASE = 0  # Without Retry-After the retry would be immediate
+    try:
+        start = time.monotonic()
+        assert asyncio.run(resilience.call("test-retry-after", upstream, deadline=5)) == "ok"
+        elapsed = time.monotonic() - start
+    finally:
+        resilience.LLM_BACKOFF_BASE = saved
+    assert upstream.calls == 2
+    assert elapsed >= 0.2, f"retried after {elapsed:.2f}s despite Retry-After: 0.2"
+
+
+def test_retry_after_beyond_deadline_gives_up():
+    fresh_breaker("test-retry-after-late")
+    upstream = FakeUpstream((0, UpstreamError(503, retry_after=60)))
+    start = time.monotonic()
+    try:
+        asyncio.run(resilience.call("test-retry-after-late", upstream, deadline=1))
+    except UpstreamError:
+        pass
+    else:
+        raise AssertionError("call succeeded against a failing upstream")
+    assert upstream.calls == 1
+    assert time.monotonic() - start < 0.5
+
+
+def test_client_errors_are_not_retried():
+    breaker = fresh_breaker("test-4xx")
+    for status in (400, 401, 404, 422):
+        upstream = FakeUpstream((0, UpstreamError(status)))
+        try:
+            asyncio.run(resilience.call("test-4xx", upstream, deadline=5))
+        except UpstreamError as e:
+            assert e.status_code == status
+        else:
+            raise AssertionError(f"HTTP {status} did not raise")
+        assert upstream.calls == 1, f"HTTP {status} was retried"
+    assert breaker.consecutive_failures == 0 and breaker.state == "closed"
+
+
+def test_breaker_opens_half_opens_and_closes():
+    breaker = fresh_breaker("test-breaker", failures=2, reset=0.2)
+    saved = resilience.LLM_RETRIES
+    resilience.LLM_RETRIES = 0
+    try:
+        failing = FakeUpstream((0, UpstreamError(503)))
+        for _ in range(2):
+            try:
+                asyncio.run(resilience.call("test-breaker", failing, deadline=5))
+            except UpstreamError:
+                pass
+        assert breaker.state == "open"
+
+        #   Open: calls fail at once without reaching upstream
+        try:
+            asyncio.run(resilience.call("test-breaker", failing, deadline=5))
+        except resilience.CircuitOpenError:
+            pass
+        else:
+            raise AssertionError("call went through an open circuit")
+        assert failing.calls == 2
+
+        #   Half-open: one trial call at a time; a failed trial opens the circuit again
+        time.sleep(0.2)
+        assert breaker.state == "half-open"
+        try:
+            asyncio.run(resilience.call("test-breaker", failing, deadline=5))
+        except UpstreamError:
+            pass
+        assert failing.calls == 3 and breaker.state == "open"
+
+        time.sleep(0.2)
+        trial = FakeUpstream((0.1, "ok"))
+
+        async def trial_and_second_caller():
+            return await asyncio.gather(resilience.call("test-breaker", trial, deadline=5),
+                                        resilience.call("test-breaker", trial, deadline=5), return_exceptions=True)
+
+        first, second = asyncio.run(trial_and_second_caller())
+        assert first == "ok"
+        assert isinstance(second, resilience.CircuitOpenError)
+        assert trial.calls == 1
+        assert breaker.state == "closed" and breaker.consecutive_failures == 0
+    finally:
+        resilience.LLM_RETRIES = saved
+
+
+def test_hedge_wins_over_slow_primary():
+    fresh_breaker("test-hedge")
+    for _ in range(resilience.LLM_HEDGE_MIN_SAMPLES):
+        resilience._latency("test-hedge").add(0.05)
+    upstream = FakeUpstream((2, "primary"), (0, "hedge"))
+    hedges = resilience.HEDGES.value(kind="test-hedge", winner="hedge")
+    start = time.monotonic()
+    assert asyncio.run(resilience.call("test-hedge", upstream, deadline=5, hedge=True)) == "hedge"
+    assert time.monotonic() - start < 1
+    assert upstream.calls == 2
+    assert resilience.HEDGES.value(kind="test-hedge", winner="hedge") - hedges == 1
+
+
+def test_fast_primary_is_not_hedged():
+    fresh_breaker("test-no-hedge")
+    for _ in range(resilience.LLM_HEDGE_MIN_SAMPLES):
+        resilience._latency("test-no-hedge").add(0.2)
+    upstream = FakeUpstream((0, "primary"))
+    assert asyncio.run(resilience.call("test-no-hedge", upstream, deadline=5, hedge=True)) == "primary"
+    assert upstream.calls == 1
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"{name} passed")
@@ -0,0 +1,48 @@
+from semantic_cache import SemanticCache, jaccard, ngrams
+
+REPLY = {"answer_type": "chit-chat", "response": {"text": "Sounds delicious! What are you having?"}}
+
+# (cached message, new message): near-identical spelling, different meaning
+OPPOSITE_PAIRS = [
+    ("I want to dine", "I want to die"),
+    ("i feel happy today", "i feel unhappy today"),
+    ("I am feeling sad today", "I am not feeling sad today"),
+    ("I am feeling sad today", "I don't feel sad today"),
+    ("วันนี้เศร้ามาก", "วันนี้ไม่เศร้ามาก"),
+]
+
+
+def test_opposite_meanings_miss_with_default_thresholds():
+    for cached, new in OPPOSITE_PAIRS:
+        cache = SemanticCache()
+        cache.put(cached, REPLY)
+        assert cache.get(new) is None, f"{new!r} reused the answer to {cached!r}"
+
+
+def test_opposite_meanings_miss_with_low_threshold():
+    """The negation and crisis checks hold even when the threshold would let the pair through."""
+    for cached, new in OPPOSITE_PAIRS:
+        cache = SemanticCache(thresholds={"chit-chat": 0.3})
+        cache.put(cached, REPLY)
+        assert cache.get(new) is None, f"{new!r} reused the answer to {cached!r} " \
+                                       f"(similarity {jaccard(ngrams(cached), ngrams(new)):.2f})"
+
+
+def test_crisis_messages_are_never_cached():
+    cache = SemanticCache(thresholds={"chit-chat": 0.3})
+    assert not cache.put("I want to die", REPLY)
+    assert not cache.put("อยากตาย", REPLY)
+    assert cache.get("I want to die") is None
+
+
+def test_near_duplicates_still_hit():
+    cache = SemanticCache()
+    cache.put("good morning everyone how are you all doing today", REPLY)
+    assert cache.get("Good morning everyone how are you all doing todayy!!") == REPLY
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"{name} passed")
@@ -0,0 +1,48 @@
+import os
+import time
+import tempfile
+import sentiment_router
+from sentiment_router import NaiveBayesRouter, SentimentRouter, lexicon_route, log_llm_answer, read_log
+
+
+def test_sad_or_unknown_emoji_go_to_the_llm():
+    for message in ("😢", "😭", "💔", "🔪", "😂💔", "👍🔪"):
+        assert lexicon_route(message) is None, message
+
+
+def test_friendly_emoji_are_settled_locally():
+    assert lexicon_route("👍🏽") == ("chit-chat", "ack")
+    assert lexicon_route("❤️") == ("chit-chat", "ack")
+    assert lexicon_route("😂😂") == ("meme", "laugh")
+
+
+def test_bare_no_gets_a_real_reply():
+    #   Even a model that has only ever seen chit-chat must not settle these
+    model = NaiveBayesRouter.train([("no", "chit-chat"), ("ไม่ค่ะ", "chit-chat"), ("😢", "chit-chat")] * 20)
+    router = SentimentRouter(model, threshold=0.5)
+    for message in ("no", "No.", "ไม่", "ไม่ค่ะ", "😢"):
+        assert router.route(message).route == "llm", message
+
+
+def test_log_is_opt_in_and_rotated():
+    assert sentiment_router.ROUTER_LOG_PATH == "" or "ROUTER_LOG_PATH" in os.environ
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "llm_inputs.jsonl")
+        saved = sentiment_router.ROUTER_LOG_MAX_BYTES
+        sentiment_router.ROUTER_LOG_MAX_BYTES = 200
+        try:
+            for i in range(20):
+                log_llm_answer(f"message {i}", {"answer_type": "chit-chat"}, path=path)
+            time.sleep(0.2)  # Written by a background thread
+        finally:
+            sentiment_router.ROUTER_LOG_MAX_BYTES = saved
+        sizes = [os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory)]
+        assert len(sizes) == 1 + sentiment_router.ROUTER_LOG_BACKUPS and max(sizes) <= 200, sizes
+        assert list(read_log(path))[-1] == ("message 19", "chit-chat")
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"{name} passed")
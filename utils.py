@@ -1,5 +1,30 @@
 from typing import List, Any
 import csv
+import importlib
+
+
+class LazyModule:
+    """
+    Stand-in for a module that is only imported on first attribute access.
+
+    Lets heavy dependencies (librosa, numpy, openai) stay out of import time:
+
+        np = LazyModule("numpy")
+        np.zeros(3)  # numpy is imported here
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._import(), attr)
+
+    def _import(self):
+        # Underscored so it cannot shadow an attribute of the real module
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
 
 
 def read_csv_with_column_filter(
@@ -3,9 +3,11 @@ import json
 import logging
 import base64
 import asyncio
-from openai import OpenAI
 from sklearn.metrics import classification_report
-from feature_detection import extract_features
+from feature_cache import cached_extract_features
+import resilience
+import llm_accounting
+from llm_client import get_async_client, timeout_for
 import re
 
 
@@ -21,13 +23,8 @@ with open(label_file_path, "r") as f:
 # Extract and normalize ground truth labels
 ground_truth = {file: annotations[0]["majority_emo"].lower() for file, annotations in emotion_labels.items()}
 
-# OpenAI client initialization
-client = OpenAI()
-
-# Ensure API key is available
-if not os.getenv("OPENAI_API_KEY"):
-    logger.error("OPENAI_API_KEY is not set in environment variables.")
-    raise EnvironmentError("Missing OPENAI_API_KEY.")
+# OpenAI client initialization (fails early if OPENAI_API_KEY is missing)
+get_async_client()
 
 logger = logging.getLogger("prompt_speech")
 
@@ -35,7 +32,7 @@ async def analyze_user_audio_input(audio_file_path: str) -> dict:
     """Processes a single audio file asynchronously by transcribing and detecting emotions."""
     try:
         # ✅ Extract features
-        features = extract_features(audio_file_path)
+        features = cached_extract_features(audio_file_path)
         if not features:
             logger.error(f"Feature extraction failed for {audio_file_path}")
             return {"error": "Feature extraction failed."}
@@ -48,8 +45,9 @@ async def analyze_user_audio_input(audio_file_path: str) -> dict:
         # ✅ Prepare feature data as a string
         feature_text = json.dumps(features, indent=2)
 
-        response = client.chat.completions.create(
+        response = await llm_accounting.measure("validate_prompt_speeach", "gpt-4o-audio-preview", lambda: resilience.call("audio", lambda: get_async_client().chat.completions.create(
             model="gpt-4o-audio-preview",
+            timeout=timeout_for("audio"),
             messages=[
                 {
                     "role": "system",
@@ -111,10 +109,10 @@ async def analyze_user_audio_input(audio_file_path: str) -> dict:
             modalities=["text"],
             temperature=1,
             max_completion_tokens=2048
-        )
+        )), answer_type="audio")
 
         # ✅ Log raw response for debugging
-        logger.info(f"Raw API Response: {response}")
+        logger.debug(f"Raw API Response: {response}")
 
         # ✅ Check if response contains expected data
         if not response.choices or not response.choices[0].message:
@@ -0,0 +1,118 @@
+"""
+Memory-mapped reader for uncompressed WAV files.
+
+Only the RIFF header is read with Python file I/O; the sample data is mapped
+with `np.memmap`, so scanning a large corpus (durations, sample rates, or
+features over short windows) does not pull every byte into Python buffers.
+
+    wav = WavFile("converted_wav/studio001/middle/clip.wav")
+    wav.sr, wav.duration   # from the header only
+    y = wav.mono()         # float32 like librosa.load(sr=None)
+"""
+import os
+import struct
+from utils import LazyModule
+
+np = LazyModule("numpy")
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# (format, bits per sample) -> (numpy dtype, scale to [-1, 1), offset), as libsndfile converts them
+SAMPLE_FORMATS = {
+    (WAVE_FORMAT_PCM, 8): ("u1", 1 / 128, -128),
+    (WAVE_FORMAT_PCM, 16): ("<i2", 1 / 32768, 0),
+    (WAVE_FORMAT_PCM, 32): ("<i4", 1 / 2147483648, 0),
+    (WAVE_FORMAT_IEEE_FLOAT, 32): ("<f4", None, 0),
+    (WAVE_FORMAT_IEEE_FLOAT, 64): ("<f8", None, 0),
+}
+
+
+class WavFile:
+    """
+    A WAV file whose samples are a read-only `(frames, channels)` memory map.
+
+    Raises ValueError for files that are not RIFF/WAVE or use a sample format
+    numpy cannot map directly (e.g. 24-bit PCM); callers fall back to librosa.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            format_tag, self.channels, self.sr, bits, data_offset, data_size = _parse_header(f, os.path.getsize(path))
+
+        if (format_tag, bits) not in SAMPLE_FORMATS:
+            raise ValueError(f"{path}: unsupported WAV sample format {format_tag:#x} with {bits} bits")
+        dtype, self._scale, self._offset = SAMPLE_FORMATS[(format_tag, bits)]
+
+        self.frames = data_size // (self.channels * bits // 8)
+        if self.frames == 0:
+            self.data = np.zeros((0, self.channels), dtype=dtype)
+        else:
+            self.data = np.memmap(path, dtype=dtype, mode="r", offset=data_offset, shape=(self.frames, self.channels))
+
+    @property
+    def duration(self) -> float:
+        return self.frames / self.sr
+
+    def mono(self, start: int = 0, stop: int = None):
+        """
+        Frames `start:stop` as mono float32, scaled like `librosa.load`.
+
+        Mono float32 files come back as a view of the memory map (no copy);
+        other formats are converted for the requested range only.
+        """
+        data = self.data[start:stop]
+        if self._scale is None and data.dtype == np.float32 and self.channels == 1:
+            return data[:, 0]
+        samples = data.astype(np.float32)
+        if self._offset:
+            samples += self._offset
+        if self._scale is not None:
+            samples *= self._scale
+        return samples[:, 0] if self.channels == 1 else np.mean(samples, axis=1)
+
+    def blocks(self, block_frames: int = 262144):
+        """Yields mono float32 blocks, so a long file never has to be converted in one piece."""
+        for start in range(0, self.frames, block_frames):
+            yield self.mono(start, start + block_frames)
+
+
+def _parse_header(f, file_size):
+    """Returns (format tag, channels, sample rate, bits per sample, data offset, data size)."""
+    header = f.read(12)
+    if len(header) < 12:
+        raise ValueError(f"{f.name}: too short for a RIFF/WAVE header")
+    riff, _, wave = struct.unpack("<4sI4s", header)
+    if riff != b"RIFF" or wave != b"WAVE":
+        raise ValueError(f"{f.name}: not a RIFF/WAVE file")
+
+    fmt = None
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            raise ValueError(f"{f.name}: no data chunk")
+        chunk_id, chunk_size = struct.unpack("<4sI", header)
+
+        if chunk_id == b"fmt ":
+            body = f.read(chunk_size)
+            if len(body) < 16:
+                raise ValueError(f"{f.name}: truncated fmt chunk")
+            format_tag, channels, sr, _, _, bits = struct.unpack("<HHIIHH", body[:16])
+            if channels == 0 or sr == 0:
+                raise ValueError(f"{f.name}: fmt chunk with {channels} channels at {sr} Hz")
+            if format_tag == WAVE_FORMAT_EXTENSIBLE and len(body) >= 26:
+                format_tag = struct.unpack("<H", body[24:26])[0]  # first two bytes of the sub-format GUID
+            fmt = (format_tag, channels, sr, bits)
+            if chunk_size % 2:
+                f.read(1)
+        elif chunk_id == b"data":
+            if fmt is None:
+                raise ValueError(f"{f.name}: data chunk before fmt chunk")
+            offset = f.tell()
+            #   Streamed WAVs may leave the size unset (0 or 0xFFFFFFFF)
+            size = min(chunk_size, file_size - offset) if chunk_size else file_size - offset
+            return fmt + (offset, size)
+        else:
+            f.seek(chunk_size + chunk_size % 2, os.SEEK_CUR)